@@ -1,11 +1,25 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from pathlib import Path
-from bs4 import BeautifulSoup
+from browser_tools import (
+    DEFAULT_BLOCKED_TYPES,
+    PageCapture,
+    enable_performance_log,
+    enable_resource_blocking,
+    format_network_stats,
+    navigate,
+    parse_list,
+    set_page_load_strategy,
+    wait_for_selector,
+)
+from extract_enf_installers import extract_listing, listing_fieldnames, listing_record
+from fetch_daemon import DEFAULT_ADDRESS as DEFAULT_DAEMON_ADDRESS, FetchClient
+from html_archive import open_archive
+from http_cache import DEFAULT_MAX_CACHE_MB, open_cache
+from page_scripts import extract_listing_js
+from parse_pool import ParsePool, default_parse_workers, fork_context
+from rate_control import DEFAULT_MAX_RATE, DEFAULT_MIN_RATE, make_pacer
+from sqlite_store import open_store
+from tab_pool import TabPool
+import argparse
 import csv
 import time
 import random
@@ -20,11 +34,131 @@ PAGE_DELAY_JITTER = 0.7
 CHROMEDRIVER_PATH = Path("drivers/chromedriver.exe")
 DEBUGGER_ADDRESS = "127.0.0.1:9222"
 BLOCK_PHRASE = "Why have I been blocked?"
+LISTING_TABLE = "table.enf-list-table"
 SCROLL_STEPS_MIN = 4
 SCROLL_STEPS_MAX = 8
 SCROLL_PAUSE_MIN = 0.3
 SCROLL_PAUSE_MAX = 0.9
 
+# ================= CLI =================
+parser = argparse.ArgumentParser(
+    description="Collect ENF installer names and links for Germany."
+)
+parser.add_argument(
+    "--cache-dir",
+    default="",
+    help="Directory for the on-disk page cache (disabled when empty).",
+)
+parser.add_argument(
+    "--max-cache-age",
+    type=float,
+    default=0.0,
+    help="Seconds a cached listing page is reused instead of reloading it "
+    "(0 never reuses, pages are only stored).",
+)
+parser.add_argument(
+    "--max-cache-mb",
+    type=float,
+    default=DEFAULT_MAX_CACHE_MB,
+    help="Cache size limit in MB; least recently used pages are evicted.",
+)
+parser.add_argument(
+    "--archive-dir",
+    default="",
+    help="Keep every fetched listing page in this raw HTML archive.",
+)
+parser.add_argument(
+    "--pacing",
+    choices=["fixed", "adaptive"],
+    default="fixed",
+    help="Fixed human-like delays, or an adaptive rate that speeds up while "
+    "pages load cleanly and backs off on blocks or slow responses.",
+)
+parser.add_argument(
+    "--min-rate",
+    type=float,
+    default=DEFAULT_MIN_RATE,
+    help="Lowest page rate (per second) for --pacing adaptive.",
+)
+parser.add_argument(
+    "--max-rate",
+    type=float,
+    default=DEFAULT_MAX_RATE,
+    help="Hard ceiling on the page rate (per second) for --pacing adaptive.",
+)
+parser.add_argument(
+    "--block-resources",
+    action="store_true",
+    help="Block images, fonts, stylesheets, ads and analytics via Chrome DevTools.",
+)
+parser.add_argument(
+    "--block-types",
+    default=",".join(DEFAULT_BLOCKED_TYPES),
+    help="Comma-separated resource types for --block-resources "
+    "(image, font, stylesheet, media).",
+)
+parser.add_argument(
+    "--block-urls",
+    default="",
+    help="Extra comma-separated URL patterns (wildcards allowed) to block.",
+)
+parser.add_argument(
+    "--page-load-strategy",
+    choices=["normal", "eager", "none"],
+    default="normal",
+    help="When driver.get() returns: after the load event (normal), after "
+    "DOMContentLoaded (eager) or right away (none).",
+)
+parser.add_argument(
+    "--cdp-capture",
+    action="store_true",
+    help="Take the HTTP status and raw HTML from Chrome DevTools instead of "
+    "serializing the rendered page.",
+)
+parser.add_argument(
+    "--tabs",
+    type=int,
+    default=1,
+    help="Load this many listing pages at once in separate tabs of the "
+    "attached browser.",
+)
+parser.add_argument(
+    "--extract",
+    choices=["html", "js"],
+    default="html",
+    help="Parse the listing in Python from the page HTML, or in the page with "
+    "JavaScript, returning only names and links.",
+)
+parser.add_argument(
+    "--daemon",
+    nargs="?",
+    const=DEFAULT_DAEMON_ADDRESS,
+    default="",
+    help="Fetch through a running fetch_daemon.py (optionally at ADDRESS) "
+    "instead of attaching to the browser.",
+)
+parser.add_argument(
+    "--parse-workers",
+    type=int,
+    nargs="?",
+    const=default_parse_workers(),
+    default=0,
+    help="Parse listing pages in N worker processes (default: cores - 1) "
+    "while the next pages load; 0 parses inline.",
+)
+parser.add_argument(
+    "--db",
+    default="",
+    help="Upsert installers into this SQLite database (keeping their detail "
+    "columns) instead of rewriting the CSV.",
+)
+args = parser.parse_args()
+cache = open_cache(args.cache_dir, args.max_cache_age, args.max_cache_mb)
+archive = open_archive(args.archive_dir)
+pacer = make_pacer(
+    args.pacing, PAGE_DELAY_BASE, PAGE_DELAY_JITTER, args.min_rate, args.max_rate
+)
+
 # ================= HUMAN-LIKE SCROLL =================
 def human_scroll(driver):
     try:
@@ -56,68 +190,230 @@ def sleep_with_jitter(base_delay, jitter):
     if delay:
         time.sleep(delay)
 
-def is_blocked(page_source):
-    return BLOCK_PHRASE in page_source
+def is_blocked(page_source, status=None):
+    return status in (403, 429, 503) or BLOCK_PHRASE in page_source
 
 # ================= CHROME SETUP =================
-chrome_options = Options()
-chrome_options.add_experimental_option("debuggerAddress", DEBUGGER_ADDRESS)
+driver = None
+capture = None
+page_pool = None
+if args.daemon:
+    # The daemon owns the browser, its tabs and the pacing.
+    page_pool = FetchClient(args.daemon)
+else:
+    # Imported here so --daemon runs never load Selenium.
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
 
-driver = webdriver.Chrome(
-    service=Service(str(CHROMEDRIVER_PATH)),
-    options=chrome_options
-)
+    chrome_options = Options()
+    chrome_options.add_experimental_option("debuggerAddress", DEBUGGER_ADDRESS)
+    set_page_load_strategy(chrome_options, args.page_load_strategy)
+    if args.block_resources or args.cdp_capture:
+        enable_performance_log(chrome_options)
+
+    driver = webdriver.Chrome(
+        service=Service(str(CHROMEDRIVER_PATH)),
+        options=chrome_options
+    )
+    if args.block_resources:
+        enable_resource_blocking(
+            driver, parse_list(args.block_types), parse_list(args.block_urls)
+        )
+
+    capture = PageCapture(
+        driver,
+        LISTING_TABLE,
+        network=args.cdp_capture,
+        performance_log=args.block_resources,
+    )
+    if args.tabs > 1:
+        page_pool = TabPool(
+            driver,
+            args.tabs,
+            "tbody",
+            capture_selector=LISTING_TABLE,
+            timeout=15,
+            pacer=pacer,
+            delay=(PAGE_DELAY_BASE, PAGE_DELAY_BASE + PAGE_DELAY_JITTER),
+            is_blocked=is_blocked,
+        )
 
 results = []
 seen = set()
 blocked_page = None
+listing_ended = False
+
+def add_links(parsed):
+    # parsed yields (page, links) in page order; False once a page had no
+    # listing table, and nothing after it is kept.
+    for _, links in parsed:
+        if links is None:
+            print("No listing table found - stopping")
+            return False
+        for item in links:
+            link = item["href"]
+            if link.startswith("/"):
+                link = BASE_URL + link
+            key = (item["name"], link)
+            if key not in seen:
+                seen.add(key)
+                record = listing_record(item)
+                # Every column of the listing row is kept (listing_*).
+                results.append({"name": record.pop("name"), "url": link, **record})
+                if store is not None:
+                    store.upsert(results[-1])
+    return True
+
+store = open_store(args.db)
+parse_pool = None
+if args.parse_workers > 0:
+    # This script has no __main__ guard, so workers must be forked.
+    if fork_context() is None:
+        print("--parse-workers needs fork(); parsing inline.")
+    else:
+        parse_pool = ParsePool(
+            args.parse_workers, extract_listing, mp_context=fork_context()
+        )
+
+def page_url(page):
+    if page == 1:
+        return f"{BASE_URL}/directory/installer/Germany"
+    return f"{BASE_URL}/directory/installer/Germany?page={page}"
+
+pages = range(START_PAGE, END_PAGE + 1)
+fetched = None
+if page_pool is not None:
+    # Results come back in page order, so cached pages can be interleaved.
+    to_fetch = [
+        page
+        for page in pages
+        if cache is None or not cache.is_fresh(cache.get(page_url(page)))
+    ]
+    jobs = [(page, page_url(page)) for page in to_fetch]
+    if args.daemon:
+        fetched = page_pool.fetch(
+            jobs, ready="tbody", capture=LISTING_TABLE, block_phrases=[BLOCK_PHRASE]
+        )
+    else:
+        fetched = page_pool.fetch(jobs)
+    to_fetch = set(to_fetch)
 
 try:
     # Step 1: Scrape pages using the already-open browser session
-    for page in range(START_PAGE, END_PAGE + 1):
-        if page == 1:
-            url = f"{BASE_URL}/directory/installer/Germany"
-        else:
-            url = f"{BASE_URL}/directory/installer/Germany?page={page}"
+    for page in pages:
+        url = page_url(page)
 
         print(f"Fetching page {page}: {url}")
-        driver.get(url)
-        sleep_with_jitter(PAGE_DELAY_BASE, PAGE_DELAY_JITTER)
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "tbody"))
-        )
-        human_scroll(driver)
+        listing = None
+        entry = cache.get(url) if cache is not None else None
+        if fetched is not None:
+            from_cache = page not in to_fetch
+        else:
+            from_cache = cache is not None and cache.is_fresh(entry)
+        if from_cache:
+            html = cache.body(entry)
+        elif fetched is not None:
+            _, result = next(fetched)
+            html = result["html"]
+            if result["blocked"]:
+                blocked_page = page
+                print(f"Blocked on page {page}. Saving current results.")
+                break
+            if not result["ready"]:
+                # A timed-out tab is not the end of the listing.
+                blocked_page = page
+                print(f"Page {page} did not load. Saving current results.")
+                break
+            if cache is not None:
+                cache.put(url, html, status=result["status"] or 200)
+            if archive is not None:
+                archive.add(url, html, "listing", status=result["status"])
+        else:
+            if pacer is not None:
+                pacer.wait()
+            started = time.monotonic()
+            capture.reset()
+            navigate(driver, url)
+            if pacer is None:
+                sleep_with_jitter(PAGE_DELAY_BASE, PAGE_DELAY_JITTER)
+            loaded = wait_for_selector(driver, "tbody", 15)
+            if pacer is not None:
+                pacer.record(latency=time.monotonic() - started)
+            human_scroll(driver)
 
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        if is_blocked(driver.page_source):
-            blocked_page = page
-            print(f"Blocked on page {page}. Saving current results.")
-            break
-        tbody = soup.find("tbody")
-        if not tbody:
-            print("No tbody found - stopping")
-            break
+            if args.extract == "js":
+                # No listing table (block or empty page): fall back to the HTML.
+                listing = extract_listing_js(driver)["links"]
+            html = ""
+            if listing is None or cache is not None or archive is not None:
+                html = capture.html
+            if args.block_resources:
+                print(f"  {format_network_stats(capture.network_stats())}")
+            if listing is None and is_blocked(html, capture.status):
+                if pacer is not None:
+                    pacer.record(blocked=True)
+                blocked_page = page
+                print(f"Blocked on page {page}. Saving current results.")
+                break
+            if not loaded and listing is None:
+                # A slow or partial page is not the end of the listing.
+                blocked_page = page
+                print(f"Page {page} did not load. Saving current results.")
+                break
+            if cache is not None:
+                cache.put(url, html, status=capture.status or 200)
+            if archive is not None:
+                archive.add(url, html, "listing", status=capture.status)
 
-        for a in tbody.find_all("a", class_="mkjs-a", href=True):
-            name = a.get_text(strip=True)
-            link = a["href"]
-            if link.startswith("/"):
-                link = BASE_URL + link
-            key = (name, link)
-            if key not in seen:
-                seen.add(key)
-                results.append([name, link])
+        links = listing
+        if parse_pool is None:
+            if links is None:
+                links = extract_listing(html)
+            parsed = [(page, links)]
+        else:
+            # Parsed in a worker while the next page loads; merged in page order.
+            if links is not None:
+                parse_pool.done(page, links)
+                parsed = parse_pool.ready()
+            elif "enf-list-table" not in html:
+                # Past the last page: settled inline, so no further page is
+                # fetched while the workers catch up.
+                parse_pool.done(page, None)
+                parsed = parse_pool.drain()
+            else:
+                parse_pool.put(page, html)
+                parsed = parse_pool.ready()
+        if not add_links(parsed):
+            listing_ended = True
+            break
+    if parse_pool is not None and not listing_ended:
+        add_links(parse_pool.drain())
 
 finally:
-    driver.quit()
+    if parse_pool is not None:
+        parse_pool.close()
+    if store is not None:
+        store.close()
+    if page_pool is not None:
+        page_pool.close()
+    if driver is not None:
+        driver.quit()
 
+if pacer is not None:
+    print(f"Final page rate: {pacer.current_rate():.2f}/s ({pacer.backoffs} back-offs)")
 print(f"Total installers collected: {len(results)}")
-with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["name", "url"])
-    writer.writerows(results)
+if store is not None:
+    print(f"Upserted into {args.db} (sqlite_store.py export-csv writes the CSV)")
+else:
+    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=listing_fieldnames(["name", "url"], results), restval=""
+        )
+        writer.writeheader()
+        writer.writerows(results)
 
-print(f"Saved to {OUTPUT_FILE}")
+    print(f"Saved to {OUTPUT_FILE}")
 if blocked_page is not None:
     print(f"Stopped at page {blocked_page}. Resume from this page later.")
 
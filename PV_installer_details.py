@@ -1,107 +1,852 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 from pathlib import Path
+from browser_pool import DEFAULT_PROFILE_TEMPLATE, BrowserPool
+from browser_tools import (
+    DEFAULT_BLOCKED_TYPES,
+    PageCapture,
+    enable_performance_log,
+    enable_resource_blocking,
+    format_network_stats,
+    navigate,
+    parse_list,
+    set_page_load_strategy,
+    wait_for_selector,
+)
+from detail_fields import extract_fields
+from fetch_daemon import DEFAULT_ADDRESS as DEFAULT_DAEMON_ADDRESS, FetchClient
+from html_archive import open_archive
+from http_cache import DEFAULT_MAX_CACHE_MB, open_cache
+from page_scripts import (
+    EXTRACT_DETAILS_FN,
+    STRIPPED_TEXT_FN,
+    extract_details_js,
+)
+from parse_pool import ParsePool, default_parse_workers
+from rate_control import (
+    DEFAULT_MAX_RATE,
+    DEFAULT_MIN_RATE,
+    AdaptiveRateController,
+    make_pacer,
+)
+from refresh import (
+    FINGERPRINT_COLUMNS,
+    ChangeReport,
+    conditional_get,
+    fingerprint,
+    make_refresh_opener,
+    validators,
+)
+from sqlite_store import open_store
+from tab_pool import TabPool
+import argparse
 import csv
+import http.client
+import json
+import os
 import time
 import random
+import zlib
+from urllib.parse import urlsplit
 
 # ================= CONFIG =================
 CSV_FILE = "germany_installers.csv"
+JOURNAL_FILE = CSV_FILE + ".journal"
+COMPACT_EVERY = 500  # rewrite the CSV after this many journaled rows
 CHROMEDRIVER_PATH = Path("drivers/chromedriver.exe")
 DEBUGGER_ADDRESS = "127.0.0.1:9222"
 
 DELAY_MIN = 1.2
 DELAY_MAX = 2.2
 BLOCK_PHRASE = "Why have I been blocked?"
+BATCH_PARALLEL = 4  # fetch() calls in flight per batch
+DETAIL_FIELDS = ["website", "telephone", "location"]
+# Listing columns (kept by PV_installer.py as listing_<header>) that already
+# hold a detail field; --listing-field adds more.
+LISTING_FIELD_COLUMNS = {
+    "website": ["listing_website"],
+    "telephone": ["listing_telephone", "listing_phone"],
+    "location": ["listing_address"],
+}
+LISTED = "LISTED"  # status of rows filled from the listing, not visited
+STALE = "STALE"  # finished rows --refresh could not check over urllib
+REFRESH_MAX_BLOCKS = 3  # consecutive blocked urllib checks before giving up
+COOKIE_FILE = "www.enfsolar.com_cookies.txt"
 
 # ================= HELPERS =================
 def human_delay():
     time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
 
-def is_blocked(html):
-    return BLOCK_PHRASE in html
+def is_blocked(html, status=None):
+    return status in (403, 429, 503) or BLOCK_PHRASE in html
 
-# ================= LOAD CSV =================
-with open(CSV_FILE, newline="", encoding="utf-8") as f:
-    rows = list(csv.DictReader(f))
+def extract_details(html):
+    # Website, telephone and address in one streaming pass; the field rules
+    # live in detail_fields.FIELD_SPECS.
+    return extract_fields(html)
 
-# Ensure required columns exist
-for r in rows:
-    r.setdefault("location", "")
-    r.setdefault("telephone", "")
-    r.setdefault("website", "")
-    r.setdefault("status", "")
+def listing_field(value):
+    field, sep, column = value.partition("=")
+    if not sep or field not in DETAIL_FIELDS or not column:
+        raise argparse.ArgumentTypeError(
+            f"expected FIELD=COLUMN with FIELD one of {', '.join(DETAIL_FIELDS)}"
+        )
+    return field, column
 
-# ================= CHROME SETUP =================
-chrome_options = Options()
-chrome_options.add_experimental_option("debuggerAddress", DEBUGGER_ADDRESS)
+def listing_values(row, field_columns):
+    # Detail fields the row's listing columns already provide.
+    values = {}
+    for field, columns in field_columns.items():
+        for column in columns:
+            if row.get(column):
+                values[field] = row[column]
+                break
+    return values
 
-driver = webdriver.Chrome(
-    service=Service(str(CHROMEDRIVER_PATH)),
-    options=chrome_options
-)
-
-try:
-    for idx, row in enumerate(rows):
-        if row["status"] == "DONE":
+# ================= REFRESH =================
+# Re-checks finished rows with a conditional GET over urllib instead of a
+# browser visit. A 304, or a page whose fields fingerprint the same, only
+# moves last_seen; a changed page is updated straight from the urllib HTML.
+# Rows urllib cannot read become STALE and are re-rendered by the browser;
+# they are returned so the ones the browser does not get to can be reported
+# as stale at the end of the run.
+def refresh_rows(rows, finish_row, opener, headers, pacer):
+    stale = []
+    blocks = 0
+    for row in rows:
+        if row["status"] != "DONE":
             continue
+        if blocks >= REFRESH_MAX_BLOCKS:
+            print(
+                f"urllib blocked {blocks} times in a row; the remaining rows keep "
+                f"their data (refresh {COOKIE_FILE} and run --refresh again)"
+            )
+            break
+        if pacer is not None:
+            pacer.wait()
+        started = time.monotonic()
+        try:
+            status, html, resp_headers = conditional_get(
+                opener, row["url"], headers, row
+            )
+        except (OSError, http.client.HTTPException) as exc:
+            print(f"  {row['url']}: {exc}")
+            status, html, resp_headers = None, "", None
+        blocked = status is not None and status != 304 and is_blocked(html, status)
+        if pacer is not None:
+            pacer.record(
+                status=status,
+                latency=time.monotonic() - started,
+                blocked=blocked,
+                failed=status is None,
+            )
+        else:
+            human_delay()
+
+        details = extract_details(html) if status == 200 and not blocked else None
+        if details is not None and not any(details.values()):
+            # An empty page where fields used to be: let the browser look.
+            if any(row[field] for field in DETAIL_FIELDS):
+                details = None
+        if status == 304:
+            finish_row(row, {}, headers=resp_headers)
+        elif details is not None:
+            finish_row(row, details, headers=resp_headers)
+        else:
+            row["status"] = STALE
+            stale.append(row)
+        blocks = blocks + 1 if blocked else 0
+    return stale
 
-        name = row["name"]
-        url = row["url"]
+# ================= BATCH FETCH =================
+# Fetches a batch of detail URLs from inside an already-open ENF page, so the
+# requests carry the browser's cookies and clearance, and parses them with
+# DOMParser. Mirrors extract_details(); returns one small JSON object per URL
+# (the HTML only when it has to be cached or archived).
+BATCH_DETAILS_JS = STRIPPED_TEXT_FN + EXTRACT_DETAILS_FN + """
+const urls = arguments[0];
+const blockPhrase = arguments[1];
+const includeHtml = arguments[2];
+const parallel = Math.max(1, arguments[3]);
+const done = arguments[arguments.length - 1];
+let stop = false;
+async function load(url) {
+  try {
+    const resp = await fetch(url, {credentials: "same-origin"});
+    const html = await resp.text();
+    const result = {url: url, status: resp.status};
+    result.blocked =
+      [403, 429, 503].includes(resp.status) || html.includes(blockPhrase);
+    if (!result.blocked && !resp.ok) {
+      // 404/500 pages have no fields; the row stays pending.
+      return {url: url, status: resp.status, blocked: false,
+              error: "HTTP " + resp.status};
+    }
+    if (result.blocked) {
+      stop = true;
+    } else {
+      const doc = new DOMParser().parseFromString(html, "text/html");
+      result.details = extractDetails(doc);
+    }
+    if (includeHtml) result.html = html;
+    return result;
+  } catch (err) {
+    return {url: url, status: null, blocked: false, error: String(err)};
+  }
+}
+const results = new Array(urls.length).fill(null);
+let next = 0;
+async function worker() {
+  while (!stop && next < urls.length) {
+    const i = next++;
+    results[i] = await load(urls[i]);
+  }
+}
+const workers = [];
+for (let i = 0; i < Math.min(parallel, urls.length); i++) workers.push(worker());
+Promise.all(workers).then(() => done(results));
+"""
 
-        print(f"[{idx}] Processing: {name}")
-        driver.get(url)
 
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
+def fetch_detail_batches(driver, jobs, size, pacer, include_html):
+    # jobs is a list of (key, url); yields (key, result) in the same order.
+    if not jobs:
+        return
+    parts = urlsplit(jobs[0][1])
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    if not driver.current_url.startswith(origin):
+        navigate(driver, origin)
+        wait_for_selector(driver, "body", 15)
+
+    for start in range(0, len(jobs), size):
+        chunk = jobs[start : start + size]
+        if pacer is not None:
+            # One rate slot per request in the batch.
+            delay = max(pacer.reserve() for _ in chunk)
+            if delay > 0:
+                time.sleep(delay)
+        elif start:
+            human_delay()
+        started = time.monotonic()
+        driver.set_script_timeout(30 + 5 * len(chunk))
+        results = driver.execute_async_script(
+            BATCH_DETAILS_JS,
+            [url for _, url in chunk],
+            BLOCK_PHRASE,
+            include_html,
+            BATCH_PARALLEL,
         )
+        latency = (time.monotonic() - started) * BATCH_PARALLEL / len(chunk)
+        for (key, url), result in zip(chunk, results):
+            if result is None:
+                result = {"url": url, "status": None, "blocked": False}
+                result["error"] = "not fetched"
+            result.setdefault("html", "")
+            if pacer is not None:
+                pacer.record(
+                    status=result["status"],
+                    latency=latency,
+                    blocked=result["blocked"],
+                    failed="error" in result,
+                )
+            yield key, result
 
-        human_delay()
+# ================= CHECKPOINT JOURNAL =================
+# One line per finished row: "<crc32>\t<json>". Appending is constant cost per
+# row; the CSV itself is only rewritten (atomically) on compaction.
+def journal_record(row):
+    payload = json.dumps(row, ensure_ascii=False, sort_keys=True)
+    crc = zlib.crc32(payload.encode("utf-8"))
+    return f"{crc:08x}\t{payload}\n".encode("utf-8")
 
-        html = driver.page_source
-        if is_blocked(html):
-            print("⚠️ BLOCKED — stopping safely")
-            break
+def replay_journal(path, rows):
+    by_url = {r["url"]: r for r in rows}
+    applied = 0
+    skipped = 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0, 0
+    with f:
+        for line in f:
+            try:
+                crc, payload = line.rstrip(b"\n").split(b"\t", 1)
+                if int(crc, 16) != zlib.crc32(payload):
+                    raise ValueError("checksum mismatch")
+                record = json.loads(payload.decode("utf-8"))
+            except ValueError:
+                # Torn write from a crash (or a corrupt line) - ignore it.
+                skipped += 1
+                continue
+            row = by_url.get(record.get("url"))
+            if row is None:
+                skipped += 1
+                continue
+            row.update(record)
+            applied += 1
+    return applied, skipped
+
+def append_journal(journal, row):
+    journal.write(journal_record(row))
+    journal.flush()
+    os.fsync(journal.fileno())
 
-        soup = BeautifulSoup(html, "html.parser")
+def fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # not supported on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
-        # ========= WEBSITE =========
-        web = soup.find("a", itemprop="url", href=True)
-        row["website"] = web["href"].strip() if web else ""
+def compact(rows, journal):
+    tmp_path = CSV_FILE + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CSV_FILE)
+    fsync_dir(CSV_FILE)
+    # The CSV now holds everything in the journal; replaying it again after a
+    # crash right here is harmless because records are full-row snapshots.
+    journal.seek(0)
+    journal.truncate()
+    journal.flush()
+    os.fsync(journal.fileno())
+
+# ================= MAIN =================
+def start_headless_chrome(profile_dir, args):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,900")
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    set_page_load_strategy(options, args.page_load_strategy)
+    driver = webdriver.Chrome(service=Service(str(CHROMEDRIVER_PATH)), options=options)
+    if args.block_resources:
+        enable_resource_blocking(
+            driver, parse_list(args.block_types), parse_list(args.block_urls)
+        )
+    return driver
 
-        # ========= TELEPHONE =========
-        tel_td = soup.find("td", itemprop="telephone")
-        if tel_td:
-            tel_a = tel_td.find("a", href=True)
-            row["telephone"] = tel_a.get_text(strip=True) if tel_a else ""
+def main():
+    # ================= CLI =================
+    parser = argparse.ArgumentParser(
+        description="Fill in website, telephone and address for ENF installers."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help="Directory for the on-disk page cache (disabled when empty).",
+    )
+    parser.add_argument(
+        "--max-cache-age",
+        type=float,
+        default=0.0,
+        help="Seconds a cached detail page is reused instead of reloading it "
+        "(0 never reuses, pages are only stored).",
+    )
+    parser.add_argument(
+        "--max-cache-mb",
+        type=float,
+        default=DEFAULT_MAX_CACHE_MB,
+        help="Cache size limit in MB; least recently used pages are evicted.",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default="",
+        help="Keep every fetched detail page in this raw HTML archive.",
+    )
+    parser.add_argument(
+        "--pacing",
+        choices=["fixed", "adaptive"],
+        default="fixed",
+        help="Fixed human-like delays, or an adaptive rate that speeds up while "
+        "pages load cleanly and backs off on blocks or slow responses.",
+    )
+    parser.add_argument(
+        "--min-rate",
+        type=float,
+        default=DEFAULT_MIN_RATE,
+        help="Lowest page rate (per second) for --pacing adaptive.",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Hard ceiling on the page rate (per second) for --pacing adaptive.",
+    )
+    parser.add_argument(
+        "--block-resources",
+        action="store_true",
+        help="Block images, fonts, stylesheets, ads and analytics "
+        "via Chrome DevTools.",
+    )
+    parser.add_argument(
+        "--block-types",
+        default=",".join(DEFAULT_BLOCKED_TYPES),
+        help="Comma-separated resource types for --block-resources "
+        "(image, font, stylesheet, media).",
+    )
+    parser.add_argument(
+        "--block-urls",
+        default="",
+        help="Extra comma-separated URL patterns (wildcards allowed) to block.",
+    )
+    parser.add_argument(
+        "--page-load-strategy",
+        choices=["normal", "eager", "none"],
+        default="normal",
+        help="When driver.get() returns: after the load event (normal), after "
+        "DOMContentLoaded (eager) or right away (none).",
+    )
+    parser.add_argument(
+        "--cdp-capture",
+        action="store_true",
+        help="Take the HTTP status and raw HTML from Chrome DevTools instead of "
+        "serializing the rendered page.",
+    )
+    parser.add_argument(
+        "--tabs",
+        type=int,
+        default=1,
+        help="Load this many detail pages at once in separate tabs of the "
+        "attached browser.",
+    )
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=1,
+        help="Run this many headless Chrome instances on copies of "
+        "--profile-template instead of the attached browser.",
+    )
+    parser.add_argument(
+        "--profile-template",
+        default=DEFAULT_PROFILE_TEMPLATE,
+        help="Chrome user data dir cloned for each --browsers instance.",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        help="Fetch detail pages K at a time with fetch() inside the attached "
+        "browser's ENF tab instead of navigating to each one.",
+    )
+    parser.add_argument(
+        "--extract",
+        choices=["html", "js"],
+        default="html",
+        help="Parse detail pages in Python from the page HTML, or in the page "
+        "with JavaScript, returning only the three fields.",
+    )
+    parser.add_argument(
+        "--daemon",
+        nargs="?",
+        const=DEFAULT_DAEMON_ADDRESS,
+        default="",
+        help="Fetch through a running fetch_daemon.py (optionally at ADDRESS) "
+        "instead of attaching to the browser.",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        nargs="?",
+        const=default_parse_workers(),
+        default=0,
+        help="Parse detail pages in N worker processes (default: cores - 1) "
+        "while the next pages load; 0 parses inline.",
+    )
+    parser.add_argument(
+        "--need",
+        default=",".join(DETAIL_FIELDS),
+        help="Comma-separated detail fields this run needs; rows whose listing "
+        "columns already hold all of them count as known.",
+    )
+    parser.add_argument(
+        "--known-from-listing",
+        choices=["visit", "last", "skip"],
+        default="visit",
+        help="Rows already known from the listing: visit them as usual, visit "
+        f"them after all others, or fill them from the listing (status {LISTED}) "
+        "without a visit.",
+    )
+    parser.add_argument(
+        "--listing-field",
+        type=listing_field,
+        action="append",
+        default=[],
+        metavar="FIELD=COLUMN",
+        help="Listing column that holds a detail field, e.g. "
+        "location=listing_address (repeatable).",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-check finished rows with conditional GETs over urllib and only "
+        "re-render the ones it cannot read.",
+    )
+    parser.add_argument(
+        "--cookie-file",
+        default=COOKIE_FILE,
+        help="Netscape cookie file for the --refresh requests.",
+    )
+    parser.add_argument(
+        "--user-agent",
+        default="",
+        help="User-Agent for the --refresh requests (default: the browser UA "
+        "saved next to --cookie-file).",
+    )
+    parser.add_argument(
+        "--change-report",
+        default="",
+        help="CSV of new, changed and stale rows for this run (default: "
+        "<csv>_changes_<time>.csv).",
+    )
+    parser.add_argument(
+        "--db",
+        default="",
+        help="Read and upsert rows in this SQLite database instead of the CSV "
+        "and its journal (imported from the CSV on first use).",
+    )
+    args = parser.parse_args()
+    needed = parse_list(args.need)
+    if not needed or any(field not in DETAIL_FIELDS for field in needed):
+        parser.error(f"--need takes fields from {', '.join(DETAIL_FIELDS)}")
+    cache = open_cache(args.cache_dir, args.max_cache_age, args.max_cache_mb)
+    archive = open_archive(args.archive_dir)
+    # Fixed mode sleeps twice per company (after load and after saving).
+    pacer = make_pacer(
+        args.pacing,
+        2 * DELAY_MIN,
+        2 * (DELAY_MAX - DELAY_MIN),
+        args.min_rate,
+        args.max_rate,
+    )
+
+    # ================= LOAD CSV =================
+    store = open_store(args.db)
+    if store is None:
+        with open(CSV_FILE, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        if not store.counts() and os.path.exists(CSV_FILE):
+            print(f"Imported {store.import_csv(CSV_FILE)} rows from {CSV_FILE}")
+        # Resuming only needs unfinished rows, found through the status index.
+        if args.refresh:
+            rows = store.rows()
         else:
-            row["telephone"] = ""
-
-        # ========= ADDRESS (comma-safe) =========
-        addr_td = soup.find("td", itemprop="address")
-        if addr_td:
-            location = " ".join(addr_td.get_text().split())
-            location = location.replace(",", " -")
-            row["location"] = location
+            rows = store.rows(exclude_status="DONE")
+
+    # Ensure required columns exist
+    for r in rows:
+        r.setdefault("location", "")
+        r.setdefault("telephone", "")
+        r.setdefault("website", "")
+        r.setdefault("status", "")
+        for column in FINGERPRINT_COLUMNS:
+            r.setdefault(column, "")
+
+    journal = None
+    if store is None:
+        applied, skipped = replay_journal(JOURNAL_FILE, rows)
+        if applied or skipped:
+            print(f"Replayed {applied} journaled rows ({skipped} skipped)")
+        journal = open(JOURNAL_FILE, "ab")
+        if applied:
+            compact(rows, journal)
+    pending = 0
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    report_path = args.change_report or (
+        f"{os.path.splitext(CSV_FILE)[0]}_changes_{stamp}.csv"
+    )
+    report = ChangeReport(report_path, DETAIL_FIELDS)
+
+    def finish_row(row, details, status="DONE", headers=None):
+        nonlocal pending
+        before = {field: row[field] for field in DETAIL_FIELDS}
+        seen_before = bool(row["fingerprint"]) or row["status"] in ("DONE", STALE)
+        row.update(details)
+        row["status"] = status
+        row["fingerprint"] = fingerprint({f: row[f] for f in DETAIL_FIELDS})
+        row["last_seen"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        row.update(validators(headers))
+        if not seen_before:
+            report.record("new", row, before)
+        elif fingerprint(before) != row["fingerprint"]:
+            report.record("changed", row, before)
         else:
-            row["location"] = ""
+            report.record("unchanged", row, before)
 
-        row["status"] = "DONE"
+        if store is not None:
+            # Batched upserts; the store commits every N rows or T seconds.
+            store.upsert(row)
+            return
 
-        # 🔒 SAVE AFTER EACH ROW
-        with open(CSV_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-            writer.writeheader()
-            writer.writerows(rows)
+        # 🔒 SAVE AFTER EACH ROW (journal append, CSV compacted every N rows)
+        append_journal(journal, row)
+        pending += 1
+        if pending >= COMPACT_EVERY:
+            compact(rows, journal)
+            pending = 0
+
+    stale = []
+    if args.refresh:
+        if args.daemon:
+            # Start from the daemon browser's current cookies and UA.
+            try:
+                client = FetchClient(args.daemon)
+                try:
+                    path, count = client.save_cookies(args.cookie_file)
+                finally:
+                    client.close()
+                print(f"Saved {count} cookies from the fetch daemon to {path}")
+            except (OSError, RuntimeError) as exc:
+                print(f"Could not get cookies from the fetch daemon: {exc}")
+        opener, headers = make_refresh_opener(args.cookie_file, args.user_agent)
+        stale = refresh_rows(rows, finish_row, opener, headers, pacer)
+
+    # ================= LISTING RULE =================
+    # Rows whose needed fields the listing already has cost a rate-limited
+    # visit each; they can go last or be filled without one.
+    order = [idx for idx, row in enumerate(rows) if row["status"] != "DONE"]
+    if args.known_from_listing != "visit":
+        field_columns = {f: list(c) for f, c in LISTING_FIELD_COLUMNS.items()}
+        for field, column in args.listing_field:
+            field_columns[field].insert(0, column)
+        known = []
+        for idx in order:
+            row = rows[idx]
+            listed = listing_values(row, field_columns)
+            if not all(row[field] or listed.get(field) for field in needed):
+                continue
+            known.append(idx)
+            if args.known_from_listing == "skip" and row["status"] != LISTED:
+                filled = {f: v for f, v in listed.items() if not row[f]}
+                finish_row(row, filled, status=LISTED)
+        known_set = set(known)
+        order = [idx for idx in order if idx not in known_set]
+        if args.known_from_listing == "last":
+            order += known
+        action = "visiting last" if args.known_from_listing == "last" else "skipped"
+        print(f"{len(known)} rows known from the listing ({action})")
+
+    # ================= CHROME SETUP =================
+    driver = None
+    capture = None
+    page_pool = None
+    if not order:
+        print("No rows left for the browser")
+    elif args.daemon:
+        # The daemon owns the browser, its tabs and the pacing.
+        page_pool = FetchClient(args.daemon)
+    elif args.browsers > 1:
+        # Every instance keeps its own delay; the controller caps them all.
+        rate_cap = pacer or AdaptiveRateController(
+            initial_rate=args.max_rate / 2,
+            min_rate=args.min_rate,
+            max_rate=args.max_rate,
+        )
+        page_pool = BrowserPool(
+            args.browsers,
+            lambda profile_dir: start_headless_chrome(profile_dir, args),
+            "body",
+            capture_selector="body",
+            template=args.profile_template,
+            timeout=15,
+            pacer=rate_cap,
+            delay=(DELAY_MIN, DELAY_MAX),
+            is_blocked=is_blocked,
+        )
+    else:
+        # Imported here so --daemon runs never load Selenium.
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        chrome_options = Options()
+        chrome_options.add_experimental_option("debuggerAddress", DEBUGGER_ADDRESS)
+        set_page_load_strategy(chrome_options, args.page_load_strategy)
+        if args.block_resources or args.cdp_capture:
+            enable_performance_log(chrome_options)
+
+        driver = webdriver.Chrome(
+            service=Service(str(CHROMEDRIVER_PATH)),
+            options=chrome_options
+        )
+        if args.block_resources:
+            enable_resource_blocking(
+                driver, parse_list(args.block_types), parse_list(args.block_urls)
+            )
+        capture = PageCapture(
+            driver,
+            "body",
+            network=args.cdp_capture,
+            performance_log=args.block_resources,
+        )
+        if args.tabs > 1:
+            page_pool = TabPool(
+                driver,
+                args.tabs,
+                "body",
+                capture_selector="body",
+                timeout=15,
+                pacer=pacer,
+                delay=(DELAY_MIN, DELAY_MAX),
+                is_blocked=is_blocked,
+            )
+
+    parse_pool = None
+    if args.parse_workers > 0:
+        parse_pool = ParsePool(args.parse_workers, extract_fields)
+
+    fetched = None
+    if order and (page_pool is not None or args.batch > 1):
+        # Results come back in `order`, so cached rows can be interleaved.
+        to_fetch = [
+            idx
+            for idx in order
+            if cache is None or not cache.is_fresh(cache.get(rows[idx]["url"]))
+        ]
+        jobs = [(idx, rows[idx]["url"]) for idx in to_fetch]
+        if args.daemon:
+            fetched = page_pool.fetch(
+                jobs, ready="body", capture="body", block_phrases=[BLOCK_PHRASE]
+            )
+        elif page_pool is not None:
+            fetched = page_pool.fetch(jobs)
+        else:
+            include_html = cache is not None or archive is not None
+            fetched = fetch_detail_batches(
+                driver, jobs, args.batch, pacer, include_html
+            )
+        to_fetch = set(to_fetch)
+
+    try:
+        for idx in order:
+            row = rows[idx]
+            name = row["name"]
+            url = row["url"]
+
+            if pacer is not None:
+                print(f"[{idx}] Processing: {name} ({pacer.current_rate():.2f}/s)")
+            else:
+                print(f"[{idx}] Processing: {name}")
+            entry = cache.get(url) if cache is not None else None
+            if fetched is not None:
+                from_cache = idx not in to_fetch
+            else:
+                from_cache = cache is not None and cache.is_fresh(entry)
+            details = None
+            if from_cache:
+                html = cache.body(entry)
+            elif fetched is not None:
+                _, result = next(fetched)
+                html = result["html"]
+                details = result.get("details")
+                if result.get("error"):
+                    print(f"  failed: {result['error']}")
+                    continue
+                if result["blocked"]:
+                    print("⚠️ BLOCKED — stopping safely")
+                    break
+                if not result.get("ready", True):
+                    # Left pending for the next run rather than saved empty.
+                    print("  page did not load; skipped")
+                    continue
+                if cache is not None and html:
+                    cache.put(url, html, status=result["status"] or 200)
+                if archive is not None and html:
+                    archive.add(url, html, "detail", status=result["status"])
+            else:
+                if pacer is not None:
+                    pacer.wait()
+                started = time.monotonic()
+                capture.reset()
+                navigate(driver, url)
+
+                if not wait_for_selector(driver, "body", 15):
+                    # Left pending for the next run rather than saved empty.
+                    if pacer is not None:
+                        pacer.record(latency=time.monotonic() - started, failed=True)
+                    print("  page did not load; skipped")
+                    continue
+
+                if pacer is None:
+                    human_delay()
+
+                status = capture.status if args.cdp_capture else None
+                if args.extract == "js":
+                    extracted = extract_details_js(driver, BLOCK_PHRASE)
+                    details = extracted["details"]
+                    status = status or extracted["status"]
+                html = ""
+                if details is None or cache is not None or archive is not None:
+                    html = capture.html
+                if args.block_resources:
+                    print(f"  {format_network_stats(capture.network_stats())}")
+                blocked = is_blocked(html, status)
+                if pacer is not None:
+                    pacer.record(latency=time.monotonic() - started, blocked=blocked)
+                if blocked:
+                    print("⚠️ BLOCKED — stopping safely")
+                    break
+                if cache is not None:
+                    cache.put(url, html, status=status or 200)
+                if archive is not None:
+                    archive.add(url, html, "detail", status=status)
+
+            if parse_pool is None:
+                if details is None:
+                    details = extract_details(html)
+                finish_row(row, details)
+            else:
+                # Parsed in a worker while the next page loads; rows are still
+                # finished in order.
+                if details is not None:
+                    parse_pool.done(idx, details)
+                else:
+                    parse_pool.put(idx, html)
+                for done_idx, done_details in parse_pool.ready():
+                    finish_row(rows[done_idx], done_details)
+
+            if not from_cache and pacer is None and fetched is None:
+                human_delay()
+
+        if parse_pool is not None:
+            for done_idx, done_details in parse_pool.drain():
+                finish_row(rows[done_idx], done_details)
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
+        if isinstance(page_pool, BrowserPool) and page_pool.restarts():
+            print(f"Restarted {page_pool.restarts()} crashed or stuck browsers")
+        if page_pool is not None:
+            page_pool.close()
+        if driver is not None:
+            driver.quit()
+        if store is not None:
+            store.close()
+        else:
+            if pending:
+                compact(rows, journal)
+            journal.close()
+        # Re-rendered rows were already reported by finish_row.
+        for row in stale:
+            if row["status"] == STALE:
+                report.record("stale", row, {f: row[f] for f in DETAIL_FIELDS})
+        report.close()
 
-        human_delay()
+    print(f"Changes: {report.summary()} (report: {report_path})")
+    print("✅ Finished safely — resume anytime")
 
-finally:
-    driver.quit()
 
-print("✅ Finished safely — resume anytime")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import queue
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from browser_tools import PageCapture, navigate, wait_for_selector
+
+
+DEFAULT_PROFILE_TEMPLATE = "chrome_profile"
+# Caches and crash dumps are rebuilt by Chrome; copying them only costs time.
+PROFILE_IGNORE = shutil.ignore_patterns(
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "ShaderCache",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "DawnCache",
+    "Crashpad",
+    "Singleton*",
+    "*.lock",
+    "lockfile",
+)
+# A copied profile would otherwise look "in use" by the template's browser.
+PROFILE_LOCKS = ["SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile"]
+MAX_ATTEMPTS = 3
+
+
+def remove_profile_locks(profile_dir):
+    for name in PROFILE_LOCKS:
+        path = os.path.join(profile_dir, name)
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def clone_profile(template, dest):
+    # Copy-on-write where the filesystem supports it (btrfs, XFS, APFS via
+    # cp -c); otherwise a plain copy without the cache directories.
+    if os.name != "nt":
+        flags = ["-c"] if os.uname().sysname == "Darwin" else ["--reflink=always"]
+        try:
+            subprocess.run(
+                ["cp", "-R", *flags, template, dest],
+                check=True,
+                capture_output=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            shutil.rmtree(dest, ignore_errors=True)
+        else:
+            remove_profile_locks(dest)
+            return dest
+    shutil.copytree(template, dest, ignore=PROFILE_IGNORE, symlinks=True)
+    remove_profile_locks(dest)
+    return dest
+
+
+class BrowserInstance:
+    def __init__(self, index, profile_dir, start_driver):
+        self.index = index
+        self.profile_dir = profile_dir
+        self.start_driver = start_driver
+        self.driver = None
+        self.restarts = 0
+        self.last_request = 0.0
+
+    def start(self):
+        remove_profile_locks(self.profile_dir)
+        self.driver = self.start_driver(self.profile_dir)
+
+    def stop(self):
+        driver, self.driver = self.driver, None
+        if driver is None:
+            return
+        # quit() on a wedged chromedriver can hang; do not wait for it.
+        thread = threading.Thread(target=driver.quit, daemon=True)
+        thread.start()
+        thread.join(10)
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def healthy(self):
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+
+
+# N headless browsers on cloned profiles, one worker thread each, pulling from
+# a shared URL queue. Every instance keeps its own spacing between requests
+# (delay) while `pacer` caps the rate of all of them together. A browser that
+# raises or stops answering is restarted on the same profile and the URL is
+# retried, up to MAX_ATTEMPTS; so is one that answers but never shows the
+# ready selector (a wedged renderer), unless the page is a block page.
+# Results are yielded in job order.
+class BrowserPool:
+    def __init__(
+        self,
+        size,
+        start_driver,
+        ready_selector,
+        capture_selector=None,
+        template=DEFAULT_PROFILE_TEMPLATE,
+        timeout=15.0,
+        pacer=None,
+        delay=(0.0, 0.0),
+        is_blocked=None,
+    ):
+        self.ready_selector = ready_selector
+        self.capture_selector = capture_selector
+        self.timeout = timeout
+        self.pacer = pacer
+        self.delay = delay
+        self.is_blocked = is_blocked
+        self.work_dir = tempfile.mkdtemp(prefix="enf-profiles-")
+        self.instances = []
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        try:
+            for index in range(max(1, size)):
+                profile_dir = os.path.join(self.work_dir, f"profile-{index}")
+                clone_profile(template, profile_dir)
+                instance = BrowserInstance(index, profile_dir, start_driver)
+                instance.start()
+                self.instances.append(instance)
+        except Exception:
+            self.close()
+            raise
+        for instance in self.instances:
+            thread = threading.Thread(target=self._work, args=(instance,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _space(self, instance):
+        low, high = self.delay
+        wait = instance.last_request + random.uniform(low, max(low, high))
+        remaining = wait - time.monotonic()
+        if remaining > 0:
+            self._stop.wait(remaining)
+        if self.pacer is not None:
+            self.pacer.wait()
+
+    def _load(self, instance, url):
+        driver = instance.driver
+        driver.set_page_load_timeout(self.timeout)
+        capture = PageCapture(driver, self.capture_selector)
+        started = time.monotonic()
+        navigate(driver, url)
+        ready = wait_for_selector(driver, self.ready_selector, self.timeout)
+        snapshot = capture.snapshot()
+        result = {
+            "url": url,
+            "html": snapshot["html"],
+            "status": snapshot["status"],
+            "ready": ready,
+            "latency": time.monotonic() - started,
+            "blocked": False,
+            "browser": instance.index,
+        }
+        if self.is_blocked is not None:
+            result["blocked"] = self.is_blocked(result["html"], result["status"])
+        return result
+
+    def _work(self, instance):
+        while not self._stop.is_set():
+            try:
+                index, key, url, attempt = self._jobs.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self._space(instance)
+            if self._stop.is_set():
+                return
+            timed_out = False
+            try:
+                result = self._load(instance, url)
+            except Exception as exc:
+                error = exc
+                result = None
+            else:
+                if not result["ready"] and not result["blocked"]:
+                    timed_out = True
+                    error = TimeoutError(
+                        f"{self.ready_selector!r} not found within {self.timeout:g}s"
+                    )
+                    result = None
+            instance.last_request = time.monotonic()
+
+            if result is None:
+                if self.pacer is not None:
+                    self.pacer.record(failed=True)
+                if timed_out or not instance.healthy():
+                    try:
+                        instance.restart()
+                    except Exception as exc:
+                        error = exc
+                if attempt + 1 < MAX_ATTEMPTS:
+                    self._jobs.put((index, key, url, attempt + 1))
+                    continue
+                result = {
+                    "url": url,
+                    "html": "",
+                    "status": None,
+                    "ready": False,
+                    "latency": 0.0,
+                    "blocked": False,
+                    "browser": instance.index,
+                    "error": str(error),
+                }
+            elif self.pacer is not None:
+                self.pacer.record(
+                    status=result["status"],
+                    latency=result["latency"],
+                    blocked=result["blocked"],
+                )
+            self._results.put((index, key, result))
+
+    def fetch(self, jobs):
+        # jobs yields (key, url); yields (key, result) in the same order.
+        # Only a few jobs per browser are queued ahead so the reorder buffer
+        # stays small.
+        jobs = iter(jobs)
+        window = 2 * len(self.instances)
+        done = {}
+        dispatched = 0
+        emitted = 0
+        exhausted = False
+        while True:
+            while not exhausted and dispatched - emitted < window:
+                try:
+                    key, url = next(jobs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                self._jobs.put((dispatched, key, url, 0))
+                dispatched += 1
+            if exhausted and emitted == dispatched:
+                return
+            try:
+                index, key, result = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if self._stop.is_set() or not any(
+                    thread.is_alive() for thread in self._threads
+                ):
+                    raise RuntimeError("Browser pool workers have stopped")
+                continue
+            done[index] = (key, result)
+            while emitted in done:
+                yield done.pop(emitted)
+                emitted += 1
+
+    def restarts(self):
+        return sum(instance.restarts for instance in self.instances)
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(self.timeout + 15)
+        for instance in self.instances:
+            instance.stop()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -0,0 +1,317 @@
+import base64
+import json
+import sys
+import time
+
+
+# File extensions per resource type for Network.setBlockedURLs. Chrome's
+# own resource-type filtering needs request interception (Fetch domain
+# events), which WebDriver's execute_cdp_cmd cannot receive, so types map to
+# the file extensions that carry them.
+RESOURCE_TYPE_EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "avif", "bmp"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "stylesheet": ["css"],
+    "media": ["mp4", "webm", "mp3", "ogg", "wav", "m3u8"],
+}
+
+
+def extension_patterns(extension):
+    # Anchored to the end of the path ("*" is the only wildcard, "?" and "#"
+    # are literal): "*.css*" would also block "/foo.css-tools/page" or a
+    # host like "cdn.icons.example".
+    return [f"*.{extension}", f"*.{extension}?*", f"*.{extension}#*"]
+
+
+RESOURCE_TYPE_PATTERNS = {
+    resource_type: [
+        pattern for extension in extensions for pattern in extension_patterns(extension)
+    ]
+    for resource_type, extensions in RESOURCE_TYPE_EXTENSIONS.items()
+}
+DEFAULT_BLOCKED_TYPES = ["image", "font", "stylesheet", "media"]
+# Ads, analytics and social widgets. Cloudflare challenge scripts are never
+# blocked, otherwise a challenge could not be solved in the browser.
+DEFAULT_BLOCKED_URLS = [
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*googlesyndication.com*",
+    "*googleadservices.com*",
+    "*doubleclick.net*",
+    "*adservice.google.*",
+    "*connect.facebook.net*",
+    "*facebook.com/tr*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*addthis.com*",
+    "*sharethis.com*",
+    "*youtube.com/embed*",
+]
+
+
+def parse_list(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def blocked_url_patterns(resource_types, extra_patterns):
+    patterns = []
+    for resource_type in resource_types:
+        if resource_type not in RESOURCE_TYPE_PATTERNS:
+            raise ValueError(
+                f"Unknown resource type {resource_type!r}; "
+                f"choose from {', '.join(RESOURCE_TYPE_PATTERNS)}."
+            )
+        patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+    patterns.extend(DEFAULT_BLOCKED_URLS)
+    patterns.extend(extra_patterns)
+    return patterns
+
+
+def enable_performance_log(options):
+    # Needed for per-page request statistics (driver.get_log("performance")).
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def enable_resource_blocking(driver, resource_types, extra_patterns=()):
+    patterns = blocked_url_patterns(resource_types, extra_patterns)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return patterns
+
+
+def read_performance_events(driver):
+    # Drains Chrome's performance log (CDP events since the previous call).
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return None
+    events = []
+    for entry in entries:
+        try:
+            events.append(json.loads(entry["message"])["message"])
+        except (KeyError, ValueError):
+            continue
+    return events
+
+
+def summarize_network(events):
+    # Blocked requests are never sent, so their size is unknown; the saving
+    # shows up as fewer requests and fewer transferred bytes per page.
+    stats = {"requests": 0, "blocked": 0, "failed": 0, "bytes": 0}
+    for message in events:
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            stats["requests"] += 1
+        elif method == "Network.loadingFinished":
+            stats["bytes"] += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed":
+            if params.get("blockedReason") == "inspector":
+                stats["blocked"] += 1
+            else:
+                stats["failed"] += 1
+    return stats
+
+
+def read_network_stats(driver):
+    events = read_performance_events(driver)
+    return None if events is None else summarize_network(events)
+
+
+def format_network_stats(stats):
+    if stats is None:
+        return "network stats unavailable"
+    return (
+        f"{stats['requests']} requests, {stats['blocked']} blocked, "
+        f"{stats['bytes'] / 1024:.0f} KB transferred"
+    )
+
+
+# Resolves once `selector` matches an element the HTML parser has finished
+# (it or an ancestor already has a following sibling, or parsing is over),
+# using a MutationObserver instead of polling. A document flagged by
+# mark_document_stale() is the page we are navigating away from.
+WAIT_FOR_SELECTOR_JS = """
+const selector = arguments[0];
+const timeoutMs = arguments[1];
+const done = arguments[arguments.length - 1];
+if (window.__enfStale) {
+  done("stale");
+  return;
+}
+function parsed(el) {
+  if (document.readyState !== "loading") return true;
+  for (let node = el; node && node !== document; node = node.parentNode) {
+    if (node.nextSibling) return true;
+  }
+  return false;
+}
+function ready() {
+  const el = document.querySelector(selector);
+  return !!el && parsed(el);
+}
+if (ready()) {
+  done("found");
+  return;
+}
+let timer = null;
+const observer = new MutationObserver(check);
+function finish(state) {
+  observer.disconnect();
+  document.removeEventListener("DOMContentLoaded", check);
+  clearTimeout(timer);
+  done(state);
+}
+function check() {
+  if (ready()) finish("found");
+}
+observer.observe(document, {childList: true, subtree: true});
+document.addEventListener("DOMContentLoaded", check);
+timer = setTimeout(() => finish(ready() ? "found" : "timeout"), timeoutMs);
+"""
+
+
+def set_page_load_strategy(options, strategy):
+    if strategy and strategy != "normal":
+        options.page_load_strategy = strategy
+
+
+def mark_document_stale(driver):
+    try:
+        driver.execute_script("window.__enfStale = true;")
+    except Exception:
+        pass
+
+
+def navigate(driver, url):
+    # With pageLoadStrategy "none" get() returns before the new document
+    # exists; the flag keeps wait_for_selector from matching the old page.
+    mark_document_stale(driver)
+    driver.get(url)
+
+
+def wait_for_selector(driver, selector, timeout):
+    # False on timeout, which is logged: the page is then missing or partial
+    # and callers must not treat it as loaded.
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            driver.set_script_timeout(remaining + 5)
+            state = driver.execute_async_script(
+                WAIT_FOR_SELECTOR_JS, selector, int(remaining * 1000)
+            )
+        except Exception:
+            # The document was replaced while the script was waiting.
+            state = "retry"
+        if state == "found":
+            return True
+        if state == "timeout":
+            break
+        time.sleep(0.05)
+    print(f"Timed out after {timeout:g}s waiting for {selector!r}", file=sys.stderr)
+    return False
+
+
+SCOPED_HTML_JS = """
+const el = arguments[0] ? document.querySelector(arguments[0]) : null;
+return (el || document.documentElement).outerHTML;
+"""
+
+
+def main_document_response(events):
+    # Navigation requests are the ones whose requestId equals their loaderId.
+    navigations = set()
+    response = None
+    for message in events:
+        params = message.get("params", {})
+        method = message.get("method")
+        if method == "Network.requestWillBeSent":
+            if params.get("type") == "Document" and (
+                params.get("requestId") == params.get("loaderId")
+            ):
+                navigations.add(params["requestId"])
+        elif method == "Network.responseReceived":
+            if params.get("requestId") in navigations:
+                response = params
+    return response
+
+
+# One snapshot of the current page per navigation, instead of a full
+# driver.page_source serialization for every check. With network=True the
+# HTTP status and raw body come from the performance log and
+# Network.getResponseBody; otherwise (or if the body is gone) the outerHTML
+# of `selector` is taken, or of the whole document when it is missing, so
+# challenge pages still reach is_blocked in full.
+class PageCapture:
+    def __init__(
+        self, driver, selector=None, network=False, performance_log=False
+    ):
+        self.driver = driver
+        self.selector = selector
+        self.network = network
+        self.performance_log = performance_log or network
+        self.events = []
+        self._snapshot = None
+
+    def _drain(self):
+        if not self.performance_log:
+            return
+        events = read_performance_events(self.driver)
+        if events:
+            self.events.extend(events)
+
+    def reset(self):
+        # Call before navigating; drops everything about the previous page.
+        self._drain()
+        self.events = []
+        self._snapshot = None
+
+    def invalidate(self):
+        # The page changed without a tracked navigation (e.g. manual solve).
+        self._snapshot = None
+
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = self._capture()
+        return self._snapshot
+
+    @property
+    def html(self):
+        return self.snapshot()["html"]
+
+    @property
+    def status(self):
+        return self.snapshot()["status"]
+
+    def _capture(self):
+        status = None
+        if self.network:
+            self._drain()
+            response = main_document_response(self.events)
+            if response is not None:
+                status = response.get("response", {}).get("status")
+                try:
+                    result = self.driver.execute_cdp_cmd(
+                        "Network.getResponseBody",
+                        {"requestId": response["requestId"]},
+                    )
+                except Exception:
+                    result = None
+                if result is not None:
+                    body = result.get("body", "")
+                    if result.get("base64Encoded"):
+                        body = base64.b64decode(body).decode(
+                            "utf-8", errors="replace"
+                        )
+                    return {"status": status, "html": body, "source": "network"}
+        html = self.driver.execute_script(SCOPED_HTML_JS, self.selector)
+        return {"status": status, "html": html or "", "source": "dom"}
+
+    def network_stats(self):
+        if not self.performance_log:
+            return None
+        self._drain()
+        return summarize_network(self.events)
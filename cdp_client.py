@@ -0,0 +1,351 @@
+import asyncio
+import base64
+import itertools
+import json
+import threading
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+from page_scripts import LISTING_EXPRESSION
+
+try:
+    from wsproto import ConnectionType, WSConnection
+    from wsproto.events import (
+        AcceptConnection,
+        CloseConnection,
+        Ping,
+        RejectConnection,
+        Request as WSRequest,
+        TextMessage,
+    )
+except ImportError:
+    WSConnection = None
+
+
+DEFAULT_DEBUGGER_ADDRESS = "127.0.0.1:9222"
+
+SCOPED_HTML_EXPR = """
+(() => {
+  const el = %s ? document.querySelector(%s) : null;
+  return (el || document.documentElement).outerHTML;
+})()
+"""
+
+
+class CDPError(RuntimeError):
+    pass
+
+
+def list_targets(debugger_address):
+    with urlopen(f"http://{debugger_address}/json/list", timeout=10) as resp:
+        return json.load(resp)
+
+
+def new_target(debugger_address, url="about:blank"):
+    # Chrome 111+ only accepts PUT for /json/new.
+    req = Request(
+        f"http://{debugger_address}/json/new?{quote(url, safe='')}", method="PUT"
+    )
+    with urlopen(req, timeout=10) as resp:
+        return json.load(resp)
+
+
+def page_websocket_url(debugger_address, new_tab=False):
+    if not new_tab:
+        for target in list_targets(debugger_address):
+            if target.get("type") == "page" and target.get("webSocketDebuggerUrl"):
+                return target["webSocketDebuggerUrl"]
+    return new_target(debugger_address)["webSocketDebuggerUrl"]
+
+
+# Minimal asyncio CDP client for one page target, talking WebSocket (wsproto)
+# straight to Chrome's --remote-debugging-port instead of going through
+# chromedriver. Commands are matched to replies by id; events feed waiters
+# plus the per-navigation lifecycle and main-document bookkeeping.
+class CDPClient:
+    def __init__(self, reader, writer, ws):
+        self._reader = reader
+        self._writer = writer
+        self._ws = ws
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._waiters = []
+        self._lifecycle = {}
+        self._documents = {}
+        self._changed = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, ws_url, timeout=10.0):
+        if WSConnection is None:
+            raise RuntimeError(
+                "wsproto is not available. Install it with: pip install wsproto"
+            )
+        parts = urlsplit(ws_url)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or 80), timeout
+        )
+        ws = WSConnection(ConnectionType.CLIENT)
+        writer.write(ws.send(WSRequest(host=parts.netloc, target=parts.path)))
+        await writer.drain()
+        while True:
+            data = await asyncio.wait_for(reader.read(65536), timeout)
+            if not data:
+                raise CDPError(f"Connection closed during handshake with {ws_url}")
+            ws.receive_data(data)
+            for event in ws.events():
+                if isinstance(event, AcceptConnection):
+                    return cls(reader, writer, ws)
+                if isinstance(event, RejectConnection):
+                    raise CDPError(f"WebSocket rejected by {ws_url}")
+
+    async def _read_loop(self):
+        text = []
+        try:
+            while True:
+                data = await self._reader.read(1 << 20)
+                if not data:
+                    break
+                self._ws.receive_data(data)
+                for event in self._ws.events():
+                    if isinstance(event, TextMessage):
+                        text.append(event.data)
+                        if event.message_finished:
+                            self._dispatch(json.loads("".join(text)))
+                            text = []
+                    elif isinstance(event, Ping):
+                        self._writer.write(self._ws.send(event.response()))
+                    elif isinstance(event, CloseConnection):
+                        self._writer.write(self._ws.send(event.response()))
+                        return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("CDP connection closed"))
+            self._pending.clear()
+
+    def _dispatch(self, message):
+        if "id" in message:
+            future = self._pending.pop(message["id"], None)
+            if future is None or future.done():
+                return
+            if "error" in message:
+                error = message["error"]
+                future.set_exception(
+                    CDPError(f"{error.get('message')} ({error.get('code')})")
+                )
+            else:
+                future.set_result(message.get("result", {}))
+            return
+
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Page.lifecycleEvent":
+            self._lifecycle.setdefault(params.get("loaderId"), set()).add(
+                params.get("name")
+            )
+            self._changed.set()
+        elif method == "Network.responseReceived":
+            # Navigation requests use the loader id as their request id.
+            if params.get("type") == "Document" and (
+                params.get("requestId") == params.get("loaderId")
+            ):
+                self._documents[params["loaderId"]] = params
+                self._changed.set()
+        for waiter in list(self._waiters):
+            wanted, predicate, future = waiter
+            if wanted == method and not future.done():
+                if predicate is None or predicate(params):
+                    future.set_result(params)
+                    self._waiters.remove(waiter)
+
+    async def send(self, method, params=None, timeout=30.0):
+        if self._closed:
+            raise CDPError("CDP connection closed")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        payload = {"id": message_id, "method": method, "params": params or {}}
+        self._writer.write(self._ws.send(TextMessage(data=json.dumps(payload))))
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def wait_for(self, method, predicate=None, timeout=30.0):
+        future = asyncio.get_running_loop().create_future()
+        waiter = (method, predicate, future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def enable(self):
+        await self.send("Page.enable")
+        await self.send("Network.enable")
+        await self.send("Page.setLifecycleEventsEnabled", {"enabled": True})
+
+    async def navigate(self, url, wait_until="DOMContentLoaded", timeout=30.0):
+        # wait_until is a Page.lifecycleEvent name: "DOMContentLoaded",
+        # "load", "networkAlmostIdle" or "networkIdle".
+        self._lifecycle.clear()
+        self._documents.clear()
+        result = await self.send("Page.navigate", {"url": url}, timeout)
+        if result.get("errorText"):
+            raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+        loader_id = result.get("loaderId")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while wait_until not in self._lifecycle.get(loader_id, ()):
+            remaining = deadline - loop.time()
+            if remaining <= 0 or self._closed:
+                raise CDPError(f"Timed out waiting for {wait_until} on {url}")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        response = self._documents.get(loader_id, {})
+        return {
+            "loader_id": loader_id,
+            "request_id": response.get("requestId"),
+            "status": response.get("response", {}).get("status"),
+            "url": response.get("response", {}).get("url", url),
+        }
+
+    async def evaluate(self, expression, await_promise=False, timeout=30.0):
+        result = await self.send(
+            "Runtime.evaluate",
+            {
+                "expression": expression,
+                "returnByValue": True,
+                "awaitPromise": await_promise,
+            },
+            timeout,
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            text = details.get("exception", {}).get("description") or details.get(
+                "text"
+            )
+            raise CDPError(f"Script failed: {text}")
+        return result.get("result", {}).get("value")
+
+    async def get_cookies(self, urls=None):
+        params = {"urls": urls} if urls else {}
+        return (await self.send("Network.getCookies", params)).get("cookies", [])
+
+    async def set_cookies(self, cookies):
+        await self.send("Network.setCookies", {"cookies": cookies})
+
+    async def response_body(self, request_id):
+        result = await self.send("Network.getResponseBody", {"requestId": request_id})
+        body = result.get("body", "")
+        if result.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", errors="replace")
+        return body
+
+    async def close(self):
+        if not self._closed:
+            try:
+                self._writer.write(self._ws.send(CloseConnection(code=1000)))
+                await self._writer.drain()
+            except Exception:
+                pass
+        self._task.cancel()
+        self._writer.close()
+
+
+# Runs a CDPClient on a private event loop thread so the synchronous
+# scrapers can call it like a WebDriver.
+class CDPSession:
+    def __init__(self, debugger_address=DEFAULT_DEBUGGER_ADDRESS, new_tab=False):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        ws_url = page_websocket_url(debugger_address, new_tab)
+        try:
+            self.client = self._call(CDPClient.connect(ws_url))
+            self._call(self.client.enable())
+        except Exception:
+            self._stop_loop()
+            raise
+
+    def _call(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def navigate(self, url, wait_until="DOMContentLoaded", timeout=30.0):
+        return self._call(self.client.navigate(url, wait_until, timeout))
+
+    def evaluate(self, expression, await_promise=False, timeout=30.0):
+        return self._call(self.client.evaluate(expression, await_promise, timeout))
+
+    def get_cookies(self, urls=None):
+        return self._call(self.client.get_cookies(urls))
+
+    def set_cookies(self, cookies):
+        self._call(self.client.set_cookies(cookies))
+
+    def response_body(self, request_id):
+        return self._call(self.client.response_body(request_id))
+
+    def page_html(self, selector=None):
+        arg = json.dumps(selector)
+        return self.evaluate(SCOPED_HTML_EXPR % (arg, arg)) or ""
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    def close(self):
+        try:
+            self._call(self.client.close(), timeout=5)
+        except Exception:
+            pass
+        self._stop_loop()
+
+
+def fetch_html_cdp(
+    session,
+    url,
+    selector=None,
+    wait_until="DOMContentLoaded",
+    timeout=30.0,
+    is_blocked=None,
+    transfer=None,
+    extract_js=False,
+    keep_html=True,
+):
+    # Drop-in for fetch_html_selenium: returns (html, blocked), with the real
+    # HTTP status in transfer["status"]. With extract_js (and a transfer dict)
+    # the links are read in the page and land in transfer["links"]; the HTML
+    # is then only returned if keep_html. Otherwise the raw main-document body
+    # when Chrome still has it, else one scoped outerHTML.
+    nav = session.navigate(url, wait_until, timeout)
+    status = nav["status"]
+    if transfer is not None:
+        transfer["status"] = status
+    html = None
+    if extract_js and transfer is not None:
+        links = session.evaluate(LISTING_EXPRESSION)["links"]
+        if links is not None:
+            # A rendered listing table is not a challenge page.
+            transfer["links"] = links
+            return (session.page_html() if keep_html else ""), False
+        html = session.page_html()
+    elif nav["request_id"]:
+        try:
+            html = session.response_body(nav["request_id"])
+        except CDPError:
+            html = None
+    if html is None:
+        html = session.page_html(selector)
+    blocked = is_blocked is not None and is_blocked(html, status)
+    return html, blocked
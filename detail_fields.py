@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import sys
+import time
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+def stripped_text(parts):
+    # BeautifulSoup's get_text(strip=True).
+    return "".join(part.strip() for part in parts if part.strip())
+
+
+def collapsed_text(parts):
+    # " ".join(get_text().split()).
+    return " ".join("".join(parts).split())
+
+
+# One entry per output field. The first element that has tag and itemprop
+# (and `attr`, when given) wins. The value is that attribute, or the text of
+# the element or of its first `inner` (tag, required attribute) descendant,
+# joined by `text` and passed through `post`. New fields go here; they do not
+# add another pass over the page.
+FIELD_SPECS = {
+    "website": {"tag": "a", "itemprop": "url", "attr": "href", "post": str.strip},
+    "telephone": {
+        "tag": "td",
+        "itemprop": "telephone",
+        "inner": ("a", "href"),
+        "text": stripped_text,
+    },
+    "location": {
+        "tag": "td",
+        "itemprop": "address",
+        "text": collapsed_text,
+        "post": lambda value: value.replace(",", " -"),
+    },
+}
+
+
+def compile_specs(specs):
+    by_tag = {}
+    for name, spec in specs.items():
+        by_tag.setdefault(spec["tag"], []).append((name, spec))
+    return by_tag
+
+
+COMPILED_SPECS = compile_specs(FIELD_SPECS)
+
+# End tags that also end an unclosed cell, as in BeautifulSoup: a missing
+# </td> must not let the capture run on past its row or table.
+TABLE_SECTIONS = {"tr", "thead", "tbody", "tfoot", "table"}
+ENCLOSING_TAGS = {"td": TABLE_SECTIONS, "th": TABLE_SECTIONS}
+
+
+# Parser-independent state machine fed start/end/data events, so html.parser
+# and lxml share the matching rules.
+class FieldCollector:
+    def __init__(self, specs=FIELD_SPECS, compiled=None):
+        self.specs = specs
+        self.by_tag = compiled if compiled is not None else compile_specs(specs)
+        self.values = {}
+        self.matched = set()
+        # Open captures: field -> [element tag, depth, inner state, text parts,
+        # enclosing tags opened inside the element]
+        self.open = {}
+
+    def start(self, tag, attrs):
+        for field, capture in self.open.items():
+            if tag == capture[0]:
+                capture[1] += 1
+            if tag in ENCLOSING_TAGS.get(capture[0], ()):
+                capture[4][tag] = capture[4].get(tag, 0) + 1
+            inner = self.specs[field].get("inner")
+            if inner and capture[2] is None and tag == inner[0] and inner[1] in attrs:
+                capture[2] = [tag, 1]
+            elif capture[2] and tag == capture[2][0]:
+                capture[2][1] += 1
+
+        for field, spec in self.by_tag.get(tag, ()):
+            if field in self.matched or attrs.get("itemprop") != spec["itemprop"]:
+                continue
+            attr = spec.get("attr")
+            if attr:
+                if attr in attrs:
+                    self.matched.add(field)
+                    self.values[field] = attrs[attr] or ""
+                continue
+            self.matched.add(field)
+            self.open[field] = [tag, 1, None, [], {}]
+
+    def end(self, tag):
+        for field, capture in list(self.open.items()):
+            inner = capture[2]
+            if inner and tag == inner[0]:
+                inner[1] -= 1
+                if inner[1] == 0:
+                    # Only the first inner element counts.
+                    capture[2] = False
+            if tag == capture[0]:
+                capture[1] -= 1
+                if capture[1] == 0:
+                    self._finish(field)
+            elif tag in ENCLOSING_TAGS.get(capture[0], ()):
+                if capture[4].get(tag):
+                    capture[4][tag] -= 1
+                else:
+                    # The row or table around the unclosed element ended.
+                    self._finish(field)
+
+    def data(self, text):
+        for field, capture in self.open.items():
+            if "inner" not in self.specs[field] or capture[2]:
+                capture[3].append(text)
+
+    def _finish(self, field):
+        capture = self.open.pop(field)
+        spec = self.specs[field]
+        if "inner" in spec and capture[2] is None:
+            self.values[field] = ""
+            return
+        self.values[field] = spec.get("text", collapsed_text)(capture[3])
+
+    def close(self):
+        for field in list(self.open):
+            self._finish(field)
+        result = {}
+        for field, spec in self.specs.items():
+            value = self.values.get(field, "")
+            post = spec.get("post")
+            result[field] = post(value) if post and value else value
+        return result
+
+
+class FieldParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__()
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {k: "" if v is None else v for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def extract_fields(html, specs=FIELD_SPECS, backend="auto"):
+    # One streaming pass; lxml's parser-target interface when available.
+    # Both match BeautifulSoup on well-formed pages. On broken markup lxml
+    # repairs the tree first: an unclosed <td> ends at the next <td>, where
+    # html.parser (like bs4) keeps it open until its row ends.
+    compiled = COMPILED_SPECS if specs is FIELD_SPECS else None
+    collector = FieldCollector(specs, compiled)
+    if backend == "lxml" or (backend == "auto" and etree is not None):
+        if etree is None:
+            raise RuntimeError(
+                "lxml is not available. Install it with: pip install lxml"
+            )
+        parser = etree.HTMLParser(target=collector)
+        parser.feed(html)
+        return parser.close()
+    parser = FieldParser(collector)
+    parser.feed(html)
+    parser.close()
+    return collector.close()
+
+
+def extract_details_soup(html):
+    # The previous BeautifulSoup implementation, kept as the benchmark
+    # reference.
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    details = {}
+    web = soup.find("a", itemprop="url", href=True)
+    details["website"] = web["href"].strip() if web else ""
+    tel_td = soup.find("td", itemprop="telephone")
+    if tel_td:
+        tel_a = tel_td.find("a", href=True)
+        details["telephone"] = tel_a.get_text(strip=True) if tel_a else ""
+    else:
+        details["telephone"] = ""
+    addr_td = soup.find("td", itemprop="address")
+    if addr_td:
+        details["location"] = " ".join(addr_td.get_text().split()).replace(",", " -")
+    else:
+        details["location"] = ""
+    return details
+
+
+def load_pages(paths, archive_dir, limit):
+    pages = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    if archive_dir:
+        from html_archive import HtmlArchive
+
+        archive = HtmlArchive(archive_dir)
+        for record in archive.records(kind="detail"):
+            pages.append(archive.read(record))
+    return pages[:limit] if limit else pages
+
+
+def bench(pages, repeat):
+    extractors = [("beautifulsoup", extract_details_soup)]
+    extractors.append(("html.parser", lambda h: extract_fields(h, backend="html")))
+    if etree is not None:
+        extractors.append(("lxml", lambda h: extract_fields(h, backend="lxml")))
+
+    reference = [extract_details_soup(html) for html in pages]
+    total_bytes = sum(len(html) for html in pages)
+    for name, extract in extractors:
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            results = [extract(html) for html in pages]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        mismatches = sum(1 for a, b in zip(results, reference) if a != b)
+        print(
+            f"{name:>14}: {best * 1000 / len(pages):7.2f} ms/page, "
+            f"{total_bytes / best / 1e6:6.1f} MB/s, {mismatches} mismatches"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the single-pass detail field extractor against "
+        "the BeautifulSoup version on saved detail pages."
+    )
+    parser.add_argument("paths", nargs="*", help="Saved detail page files or globs.")
+    parser.add_argument("--archive-dir", default="", help="Use archived detail pages.")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most N pages.")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs.")
+    args = parser.parse_args()
+
+    pages = load_pages(args.paths, args.archive_dir, args.limit)
+    if not pages:
+        print("No pages given (paths or --archive-dir).", file=sys.stderr)
+        sys.exit(1)
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB avg")
+    bench(pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
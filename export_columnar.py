@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import datetime
+import os
+import re
+import sys
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from extract_enf_installers import LISTING_COLUMN_PREFIX
+from sqlite_store import company_slug, open_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:
+    pa = None
+
+
+DEFAULT_CSV = "germany_installers.csv"
+DEFAULT_OUTPUT_DIR = "installers_dataset"
+DEFAULT_COUNTRY = "Germany"
+FORMATS = {"parquet": "parquet", "ipc": "arrow"}
+PARTITION_COLUMNS = ["country", "crawl_date"]
+
+# Plain strings are (nearly) unique per company; dictionary columns repeat
+# across rows, so each file stores every distinct value once plus int32
+# indices. listing_* columns are dictionary-encoded as well.
+STRING_COLUMNS = [
+    "name",
+    "url",
+    "slug",
+    "website",
+    "telephone",
+    "location",
+    "fingerprint",
+    "etag",
+    "last_modified",
+]
+DICTIONARY_COLUMNS = ["domain", "postcode", "city", "status"]
+
+# "Spechthausen 5a - 16225 Eberswalde", "Allinger Straße 3 - 94474 - Vilshofen",
+# "Blauenstraße 2/1 - D-79576 Weil am Rhein"
+POSTCODE_RE = re.compile(r"^(?:[A-Z]{1,2}-)?(\d{4,5})(?:\s+(.*))?$")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError(
+            "pyarrow is not available. Install it with: pip install pyarrow"
+        )
+
+
+def split_location(location):
+    # (postcode, city); the city follows the postcode in the same " - " part
+    # or in the next one.
+    parts = [part.strip() for part in location.split(" - ")]
+    for index, part in enumerate(parts):
+        match = POSTCODE_RE.match(part)
+        if match:
+            city = match.group(2)
+            if not city and index + 1 < len(parts):
+                city = parts[index + 1]
+            return match.group(1), city or ""
+    return "", ""
+
+
+def website_domain(website):
+    host = urlsplit(website if "//" in website else f"//{website}").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def url_country(url, default):
+    # .../aesolar?directory=installer&list=Germany -> "Germany"
+    return parse_qs(urlsplit(url).query).get("list", [default])[0] or default
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_company_id(value):
+    value = (value or "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def load_rows(csv_path=DEFAULT_CSV, db_path=""):
+    store = open_store(db_path)
+    if store is not None:
+        try:
+            return store.rows()
+        finally:
+            store.close()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def build_columns(rows, crawl_date, country=DEFAULT_COUNTRY):
+    # Row dicts (CSV or SQLite) -> {column: list of typed values}. Empty
+    # strings become nulls.
+    listing = []
+    for row in rows:
+        for key in row:
+            if key.startswith(LISTING_COLUMN_PREFIX) and key not in listing:
+                listing.append(key)
+    names = (
+        STRING_COLUMNS
+        + DICTIONARY_COLUMNS
+        + ["company_id", "last_seen"]
+        + listing
+        + PARTITION_COLUMNS
+    )
+    columns = {name: [] for name in names}
+    for row in rows:
+        url = row.get("url") or ""
+        postcode, city = split_location(row.get("location") or "")
+        values = dict(
+            row,
+            url=url,
+            slug=company_slug(url) if url else "",
+            domain=website_domain(row.get("website") or ""),
+            postcode=postcode,
+            city=city,
+        )
+        for name in STRING_COLUMNS + DICTIONARY_COLUMNS + listing:
+            columns[name].append(values.get(name) or None)
+        columns["company_id"].append(parse_company_id(row.get("company_id")))
+        columns["last_seen"].append(parse_timestamp(row.get("last_seen")))
+        columns["country"].append(url_country(url, country))
+        columns["crawl_date"].append(crawl_date)
+    return columns, listing
+
+
+def build_table(rows, crawl_date, country=DEFAULT_COUNTRY):
+    require_pyarrow()
+    columns, listing = build_columns(rows, crawl_date, country)
+    arrays = {}
+    for name, values in columns.items():
+        if name in STRING_COLUMNS:
+            arrays[name] = pa.array(values, pa.string())
+        elif name in DICTIONARY_COLUMNS or name in listing:
+            arrays[name] = pa.array(values, pa.string()).dictionary_encode()
+        elif name == "company_id":
+            arrays[name] = pa.array(values, pa.int64())
+        elif name == "last_seen":
+            arrays[name] = pa.array(values, pa.timestamp("ms"))
+        elif name == "country":
+            arrays[name] = pa.array(values, pa.string())
+        else:
+            arrays[name] = pa.array(values, pa.date32())
+    return pa.table(arrays)
+
+
+def partitioning():
+    return ds.partitioning(
+        pa.schema([("country", pa.string()), ("crawl_date", pa.date32())]),
+        flavor="hive",
+    )
+
+
+def write_dataset(table, output_dir, file_format="parquet"):
+    # <output_dir>/country=Germany/crawl_date=2026-10-18/part-0.parquet.
+    # Exporting the same country and day again replaces that partition
+    # only; other snapshots are left in place. IPC files are written
+    # uncompressed so readers can memory-map them.
+    require_pyarrow()
+    if file_format == "parquet":
+        options = ds.ParquetFileFormat().make_write_options(compression="zstd")
+    else:
+        options = ds.IpcFileFormat().make_write_options(compression=None)
+    ds.write_dataset(
+        table,
+        output_dir,
+        format=file_format,
+        file_options=options,
+        partitioning=partitioning(),
+        basename_template="part-{i}." + FORMATS[file_format],
+        existing_data_behavior="delete_matching",
+    )
+
+
+def open_dataset(output_dir, file_format="parquet"):
+    # Every country and snapshot as one dataset; filters on country and
+    # crawl_date prune whole directories, and IPC files are memory-mapped
+    # instead of read. Snapshots can differ in their listing_* columns, so
+    # the schema is unified over every file (dataset() alone takes the first
+    # file's); files without a column read it as nulls.
+    require_pyarrow()
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    dataset = ds.dataset(
+        output_dir,
+        format=file_format,
+        partitioning=partitioning(),
+        filesystem=filesystem,
+    )
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if not schemas:
+        return dataset
+    schema = pa.unify_schemas(schemas + [partitioning().schema])
+    return ds.dataset(
+        dataset.files,
+        schema=schema,
+        format=file_format,
+        partitioning=partitioning(),
+        partition_base_dir=output_dir,
+        filesystem=filesystem,
+    )
+
+
+def export(rows, output_dir, file_format="parquet", crawl_date=None, country=None):
+    crawl_date = crawl_date or datetime.date.today()
+    table = build_table(rows, crawl_date, country or DEFAULT_COUNTRY)
+    write_dataset(table, output_dir, file_format)
+    return table.num_rows
+
+
+def crawl_date_arg(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the installer dataset as Parquet or Arrow IPC, "
+        "partitioned by country and crawl date."
+    )
+    parser.add_argument("command", choices=["export", "stats"])
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="Details CSV to export.")
+    parser.add_argument(
+        "--db",
+        default="",
+        help="Export from this SQLite store (see sqlite_store.py) instead of "
+        "the CSV.",
+    )
+    parser.add_argument(
+        "--output-dir", default=DEFAULT_OUTPUT_DIR, help="Dataset root directory."
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="parquet",
+        help="parquet (zstd-compressed) or ipc (uncompressed Arrow files that "
+        "can be memory-mapped).",
+    )
+    parser.add_argument(
+        "--crawl-date",
+        type=crawl_date_arg,
+        default=None,
+        help="Snapshot date for the crawl_date partition (default: today).",
+    )
+    parser.add_argument(
+        "--country",
+        default=DEFAULT_COUNTRY,
+        help="Country for rows whose URL has no list= parameter.",
+    )
+    args = parser.parse_args()
+
+    try:
+        require_pyarrow()
+    except RuntimeError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == "export":
+        try:
+            rows = load_rows(args.csv, args.db)
+        except FileNotFoundError:
+            print(f"CSV not found: {args.csv}", file=sys.stderr)
+            sys.exit(1)
+        count = export(
+            rows, args.output_dir, args.format, args.crawl_date, args.country
+        )
+        print(f"Wrote {count} companies to {args.output_dir} ({args.format})")
+        return
+
+    if not os.path.isdir(args.output_dir):
+        print(f"No dataset at {args.output_dir}", file=sys.stderr)
+        sys.exit(1)
+    dataset = open_dataset(args.output_dir, args.format)
+    partitions = dataset.to_table(columns=PARTITION_COLUMNS)
+    counts = Counter(
+        zip(*(partitions.column(name).to_pylist() for name in PARTITION_COLUMNS))
+    )
+    for (country, crawl_date), count in sorted(counts.items()):
+        print(f"{country} {crawl_date}: {count} companies")
+    print(f"{dataset.count_rows()} companies in {len(dataset.files)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,56 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import codecs
 import csv
+import http.client
 import http.cookiejar
+import io
 import os
 import random
+import re
+import ssl
 import sys
+import threading
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from html.parser import HTMLParser
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
 from urllib.error import HTTPError, URLError
 from urllib.request import HTTPCookieProcessor, Request, build_opener
 
+from browser_pool import DEFAULT_PROFILE_TEMPLATE, BrowserPool
+from browser_tools import (
+    DEFAULT_BLOCKED_TYPES,
+    PageCapture,
+    enable_performance_log,
+    enable_resource_blocking,
+    format_network_stats,
+    mark_document_stale,
+    navigate as navigate_to,
+    parse_list,
+    set_page_load_strategy,
+    wait_for_selector,
+)
+from cdp_client import DEFAULT_DEBUGGER_ADDRESS, CDPSession, fetch_html_cdp
+from html_archive import open_archive
+from page_scripts import extract_listing_js
+from http_cache import DEFAULT_MAX_CACHE_MB, open_cache
+from parse_pool import ParsePool, default_parse_workers
+from rate_control import (
+    DEFAULT_MAX_RATE,
+    DEFAULT_MIN_RATE,
+    make_pacer,
+    parse_retry_after,
+)
+from sqlite_store import open_store
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 DEFAULT_BASE_URL = "https://www.enfsolar.com/directory/installer/Germany?page={page}"
 DEFAULT_HOME_URL = "https://www.enfsolar.com/"
@@ -27,15 +67,51 @@ USER_AGENTS = [
     "Firefox/121.0",
 ]
 DEFAULT_UA = USER_AGENTS[0]
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+READ_CHUNK = 64 * 1024
+DRAIN_LIMIT = 64 * 1024
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([A-Za-z0-9_.:-]+)""", re.I)
+
+
+# Listing columns keep their header as name, prefixed so they cannot collide
+# with the fields the scripts add themselves (name, url, status, details).
+LISTING_COLUMN_PREFIX = "listing_"
 
 
+# Collects every company link (a.mkjs-a with data-company-id) as a dict with
+# href, name and company_id. Links inside the listing table's tbody also get
+# "columns": one [header, text] pair per cell of their row, headers taken
+# from the table's thead.
 class InstallerLinkParser(HTMLParser):
     def __init__(self):
         super().__init__()
         self.links = []
+        self.headers = []
+        self.table_seen = False
+        # Set once the listing table's tbody (or the table) has closed, so a
+        # streaming reader can stop before the footer and scripts.
+        self.done = False
+        self._table_depth = 0
+        self._in_thead = False
+        self._in_tbody = False
+        self._header = None
+        self._row = None
+        self._cell = None
+        self._link = None
+        self._link_text = []
 
     def handle_starttag(self, tag, attrs):
-        if tag.lower() != "a":
+        tag = tag.lower()
+        if tag == "table":
+            if self._table_depth:
+                self._table_depth += 1
+            elif "enf-list-table" in (dict(attrs).get("class") or "").split():
+                self._table_depth = 1
+                self.table_seen = True
+            return
+        if self._table_depth == 1:
+            self._table_tag(tag, dict(attrs))
+        if tag != "a":
             return
 
         attr_map = dict(attrs)
@@ -43,14 +119,99 @@ class InstallerLinkParser(HTMLParser):
         if not href:
             return
 
-        # Company links have mkjs-a and a data-company-id attribute.
+        # Company links have mkjs-a and a data-company-id attribute, or sit
+        # in a listing row that carries the id.
         cls = attr_map.get("class", "")
         if "mkjs-a" not in cls.split():
             return
-        if "data-company-id" not in attr_map:
+        row_id = self._row["company_id"] if self._row is not None else ""
+        if "data-company-id" not in attr_map and not row_id:
             return
 
-        self.links.append(href)
+        self._link = {
+            "href": href,
+            "name": "",
+            "company_id": attr_map.get("data-company-id") or "",
+            "columns": [],
+        }
+        self._link_text = []
+        self.links.append(self._link)
+        if self._row is not None:
+            self._row["links"].append(self._link)
+
+    def _table_tag(self, tag, attr_map):
+        if tag == "thead":
+            self._in_thead = True
+        elif tag == "tbody":
+            self._in_thead = False
+            self._in_tbody = True
+        elif tag == "th" and self._in_thead:
+            self._header = []
+        elif tag == "tr" and self._in_tbody:
+            self._end_row()
+            self._row = {
+                "cells": [],
+                "links": [],
+                "company_id": attr_map.get("data-company-id") or "",
+            }
+        elif tag in ("td", "th") and self._row is not None:
+            self._end_cell()
+            self._cell = []
+
+    def handle_data(self, data):
+        if self._header is not None:
+            self._header.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+        if self._link is not None:
+            self._link_text.append(data)
+
+    def handle_endtag(self, tag):
+        tag = tag.lower()
+        if tag == "a" and self._link is not None:
+            self._link["name"] = "".join(
+                part.strip() for part in self._link_text if part.strip()
+            )
+            self._link = None
+        if not self._table_depth:
+            return
+        if self._table_depth == 1:
+            if tag == "th" and self._header is not None:
+                self.headers.append(" ".join("".join(self._header).split()))
+                self._header = None
+            elif tag in ("td", "th"):
+                self._end_cell()
+            elif tag == "tr":
+                self._end_row()
+            elif tag == "thead":
+                self._in_thead = False
+        if tag == "tbody" and self._table_depth == 1:
+            self._end_row()
+            self._in_tbody = False
+            self.done = True
+        elif tag == "table":
+            self._table_depth -= 1
+            if not self._table_depth:
+                self._end_row()
+                self.done = True
+
+    def _end_cell(self):
+        if self._cell is not None:
+            self._row["cells"].append(" ".join("".join(self._cell).split()))
+            self._cell = None
+
+    def _end_row(self):
+        if self._row is None:
+            return
+        self._end_cell()
+        row, self._row = self._row, None
+        columns = [
+            [self.headers[i] if i < len(self.headers) else "", text]
+            for i, text in enumerate(row["cells"])
+        ]
+        for link in row["links"]:
+            link["columns"] = columns
+            link["company_id"] = link["company_id"] or row["company_id"]
 
 
 def is_blocked(html, status_code):
@@ -70,6 +231,241 @@ def is_blocked(html, status_code):
     return False
 
 
+def accept_encoding():
+    encodings = ["gzip", "deflate"]
+    if brotli is not None:
+        encodings.append("br")
+    return ", ".join(encodings)
+
+
+class DeflateDecompressor:
+    # "deflate" is supposed to be zlib-wrapped, but some servers send a raw
+    # deflate stream; pick the right one from the first bytes.
+    def __init__(self):
+        self._obj = None
+
+    def decompress(self, data, max_length=0):
+        if self._obj is None:
+            if not data:
+                return b""
+            zlib_header = len(data) >= 2 and (data[0] & 0x0F) == 8 and (
+                (data[0] << 8) | data[1]
+            ) % 31 == 0
+            wbits = zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS
+            self._obj = zlib.decompressobj(wbits)
+        return self._obj.decompress(data, max_length)
+
+    @property
+    def unconsumed_tail(self):
+        return self._obj.unconsumed_tail if self._obj is not None else b""
+
+    def flush(self):
+        return self._obj.flush() if self._obj is not None else b""
+
+
+class BrotliDecompressor:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+
+    def decompress(self, data):
+        if hasattr(self._obj, "process"):
+            return self._obj.process(data)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return b""
+
+
+def make_decompressors(content_encoding):
+    decompressors = []
+    for encoding in (content_encoding or "").lower().split(","):
+        encoding = encoding.strip()
+        if encoding in ("", "identity"):
+            continue
+        if encoding in ("gzip", "x-gzip"):
+            decompressors.append(zlib.decompressobj(16 + zlib.MAX_WBITS))
+        elif encoding == "deflate":
+            decompressors.append(DeflateDecompressor())
+        elif encoding == "br" and brotli is not None:
+            decompressors.append(BrotliDecompressor())
+        else:
+            raise URLError(f"Unsupported Content-Encoding: {encoding}")
+    # Codings are listed in the order they were applied.
+    decompressors.reverse()
+    return decompressors
+
+
+def decompress_pieces(decompressors, data):
+    # zlib-based decoders can bound their output, so a highly compressed
+    # chunk is expanded piece by piece and a streaming reader that stops
+    # early never inflates the rest of it.
+    if not decompressors:
+        yield data
+        return
+    decompressor, rest = decompressors[0], decompressors[1:]
+    if not hasattr(decompressor, "unconsumed_tail"):
+        yield from decompress_pieces(rest, decompressor.decompress(data))
+        return
+    while data:
+        piece = decompressor.decompress(data, READ_CHUNK)
+        data = decompressor.unconsumed_tail
+        yield from decompress_pieces(rest, piece)
+
+
+def iter_body(resp, transfer=None):
+    headers = resp.headers
+    content_encoding = headers.get("Content-Encoding", "") if headers else ""
+    decompressors = make_decompressors(content_encoding)
+    if transfer is not None:
+        transfer["encoding"] = content_encoding or "identity"
+    # read1 returns whatever has arrived instead of blocking for a full chunk,
+    # which lets streaming callers stop early.
+    read = getattr(resp, "read1", None) or resp.read
+    wire_bytes = 0
+    body_bytes = 0
+    while True:
+        chunk = read(READ_CHUNK)
+        if not chunk:
+            break
+        wire_bytes += len(chunk)
+        for piece in decompress_pieces(decompressors, chunk):
+            body_bytes += len(piece)
+            if transfer is not None:
+                transfer["wire_bytes"] = wire_bytes
+                transfer["body_bytes"] = body_bytes
+            if piece:
+                yield piece
+    tail = b""
+    for decompressor in decompressors:
+        tail = decompressor.decompress(tail) + decompressor.flush()
+    body_bytes += len(tail)
+    if transfer is not None:
+        transfer["wire_bytes"] = wire_bytes
+        transfer["body_bytes"] = body_bytes
+    if tail:
+        yield tail
+
+
+def response_charset(headers, head):
+    candidates = []
+    if headers is not None:
+        candidates.append(headers.get_content_charset())
+    match = META_CHARSET_RE.search(head[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for charset in candidates:
+        if not charset:
+            continue
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+def read_body(resp, transfer=None):
+    body = b"".join(iter_body(resp, transfer))
+    charset = response_charset(resp.headers, body)
+    if transfer is not None:
+        transfer["charset"] = charset
+    return body.decode(charset, errors="replace")
+
+
+def stream_links(resp, transfer=None):
+    # Decode and parse chunks as they arrive and stop reading as soon as the
+    # listing table is complete. Returns the HTML read so far and the parser.
+    chunks = iter_body(resp, transfer)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 4096:
+            break
+    charset = response_charset(resp.headers, head)
+    decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    parser = InstallerLinkParser()
+    parts = []
+    data = head
+    exhausted = False
+    while True:
+        text = decoder.decode(data, final=exhausted)
+        if text:
+            parts.append(text)
+            parser.feed(text)
+        if parser.done or exhausted:
+            break
+        data = next(chunks, None)
+        if data is None:
+            data = b""
+            exhausted = True
+    chunks.close()
+    parser.close()
+    if transfer is not None:
+        transfer["charset"] = charset
+        transfer["truncated"] = not exhausted
+    return "".join(parts), parser
+
+
+# Failure classes for the urllib retry policy.
+TRANSIENT = "transient"
+SERVER_ERROR = "server_error"
+THROTTLED = "throttled"
+BLOCKED = "blocked"
+FATAL = "fatal"
+
+
+def classify_status(status, retry_after):
+    if status in (429, 503) and retry_after is not None:
+        return THROTTLED
+    if status in (403, 429, 503):
+        return BLOCKED
+    if 500 <= status < 600:
+        return SERVER_ERROR
+    return FATAL
+
+
+class RetryExhausted(URLError):
+    def __init__(self, url, kind, attempts, status=None, error=None):
+        super().__init__(f"{kind} after {attempts} attempt(s): {error or status}")
+        self.url = url
+        self.kind = kind
+        self.attempts = attempts
+        self.status = status
+        self.error = error
+
+    def __str__(self):
+        return str(self.reason)
+
+
+class RetryPolicy:
+    # Exponential backoff with decorrelated jitter (each delay is drawn
+    # between the base and three times the previous one), capped per delay
+    # and by a total waiting budget per URL.
+    def __init__(self, retries, base_delay, max_delay=60.0, budget=300.0):
+        self.retries = max(0, retries)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.budget = budget
+
+    def next_delay(self, kind, previous, retry_after):
+        if kind == THROTTLED:
+            return retry_after
+        # Timeouts and resets are usually gone after a short pause; 5xx
+        # responses need the server to recover, so start higher.
+        base = self.base_delay * (0.5 if kind == TRANSIENT else 1.0)
+        upper = max(base, previous * 3.0)
+        return min(self.max_delay, random.uniform(base, upper))
+
+
+def write_dead_letters(path, dead_letters):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url", "reason", "attempts", "status", "error"])
+        for exc in dead_letters:
+            writer.writerow(
+                [exc.url, exc.kind, exc.attempts, exc.status or "", exc.error or ""]
+            )
+
+
 def sleep_with_jitter(base_delay, jitter):
     base = max(0.0, base_delay)
     extra = max(0.0, jitter)
@@ -78,11 +474,199 @@ def sleep_with_jitter(base_delay, jitter):
         time.sleep(delay)
 
 
+class PooledResponse:
+    def __init__(self, pool, key, conn, resp, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self.url = url
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def read(self, amt=None):
+        return self._resp.read(amt)
+
+    def read1(self, amt=-1):
+        return self._resp.read1(amt)
+
+    def close(self):
+        if self._conn is None:
+            return
+        # Only a fully consumed response leaves the socket reusable; a small
+        # unread remainder (e.g. after a streaming parse stopped early) is
+        # drained, anything larger costs less as a new connection.
+        resp = self._resp
+        if not resp.isclosed() and resp.length is not None:
+            if resp.length <= DRAIN_LIMIT:
+                try:
+                    resp.read()
+                except (OSError, http.client.HTTPException):
+                    pass
+        reusable = resp.isclosed() and not resp.will_close
+        self._resp.close()
+        if reusable:
+            self._pool.release(self._key, self._conn)
+        else:
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Keep-alive HTTP/1.1 transport with the same open() API as a urllib opener.
+class ConnectionPool:
+    def __init__(self, jar, idle_timeout=30.0, max_redirects=5):
+        self.jar = jar
+        self.idle_timeout = idle_timeout
+        self.max_redirects = max_redirects
+        self._idle = {}
+        self._ssl_context = ssl.create_default_context()
+        self.stats = {"requests": 0, "reused": 0, "connections": 0, "reconnects": 0}
+
+    def _connect(self, key, timeout):
+        scheme, host, port = key
+        self.stats["connections"] += 1
+        if scheme == "https":
+            return http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        idle = self._idle.get(key) or []
+        now = time.monotonic()
+        while idle:
+            conn, last_used = idle.pop()
+            if conn.sock is None or now - last_used > self.idle_timeout:
+                conn.close()
+                continue
+            conn.timeout = timeout
+            conn.sock.settimeout(timeout)
+            return conn, True
+        return self._connect(key, timeout), False
+
+    def release(self, key, conn):
+        if conn.sock is None:
+            return
+        self._idle.setdefault(key, []).append((conn, time.monotonic()))
+
+    def close(self):
+        for idle in self._idle.values():
+            for conn, _ in idle:
+                conn.close()
+        self._idle.clear()
+
+    def _send(self, req, timeout):
+        self.jar.add_cookie_header(req)
+        parts = urlsplit(req.full_url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = dict(req.header_items())
+        headers["Connection"] = "keep-alive"
+
+        self.stats["requests"] += 1
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(req.get_method(), path, body=req.data, headers=headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as err:
+                conn.close()
+                if reused and attempt == 0:
+                    # The server dropped an idle keep-alive socket; retry once
+                    # on a fresh connection.
+                    self.stats["reconnects"] += 1
+                    continue
+                raise URLError(err) from err
+            if reused:
+                self.stats["reused"] += 1
+            break
+
+        self.jar.extract_cookies(resp, req)
+        return PooledResponse(self, key, conn, resp, req.full_url)
+
+    def open(self, req, timeout=None):
+        for _ in range(self.max_redirects + 1):
+            resp = self._send(req, timeout)
+            location = resp.headers.get("Location")
+            if resp.status in REDIRECT_CODES and location:
+                with resp:
+                    resp.read()
+                url = urljoin(req.full_url, location)
+                # Only the caller's headers: the jar adds the cookies for the new
+                # URL, including any the redirect response just set.
+                req = Request(url, headers=dict(req.headers))
+                continue
+            if resp.status >= 400:
+                with resp:
+                    body = resp.read()
+                raise HTTPError(
+                    resp.url, resp.status, resp.reason, resp.headers, io.BytesIO(body)
+                )
+            return resp
+        raise URLError(f"Too many redirects for {req.full_url}")
+
+
+# Gives every worker thread its own opener (connection pools are not
+# thread-safe); they all share one cookie jar.
+class ThreadLocalOpener:
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._openers = []
+
+    def _get(self):
+        opener = getattr(self._local, "opener", None)
+        if opener is None:
+            opener = self._factory()
+            self._local.opener = opener
+            with self._lock:
+                self._openers.append(opener)
+        return opener
+
+    def open(self, req, timeout=None):
+        return self._get().open(req, timeout=timeout)
+
+    @property
+    def stats(self):
+        pools = [o.stats for o in self._openers if hasattr(o, "stats")]
+        if not pools:
+            return None
+        return {key: sum(p[key] for p in pools) for key in pools[0]}
+
+    def close(self):
+        for opener in self._openers:
+            opener.close()
+
+
 def make_opener():
     jar = http.cookiejar.CookieJar()
     return build_opener(HTTPCookieProcessor(jar)), jar
 
 
+def make_pooled_opener(idle_timeout):
+    jar = http.cookiejar.CookieJar()
+    return ConnectionPool(jar, idle_timeout=idle_timeout), jar
+
+
 def load_cookie_jar(cookie_file):
     jar = http.cookiejar.MozillaCookieJar()
     try:
@@ -94,34 +678,249 @@ def load_cookie_jar(cookie_file):
     return jar
 
 
-def fetch_html_urllib(url, opener, headers, timeout, retries, retry_delay, retry_jitter):
+def save_cookie_jar(jar, cookie_file):
+    out = http.cookiejar.MozillaCookieJar()
+    for cookie in jar:
+        out.set_cookie(cookie)
+    tmp_path = cookie_file + ".tmp"
+    out.save(tmp_path, ignore_discard=True, ignore_expires=True)
+    os.replace(tmp_path, cookie_file)
+
+
+def user_agent_file(cookie_file):
+    # Clearance cookies only work with the User-Agent they were issued to,
+    # so the browser's UA is kept next to the cookie file.
+    return cookie_file + ".ua"
+
+
+def load_user_agent(cookie_file):
+    try:
+        with open(user_agent_file(cookie_file), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def save_user_agent(user_agent, cookie_file):
+    path = user_agent_file(cookie_file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(user_agent + "\n")
+    os.replace(tmp_path, path)
+
+
+def driver_cookies_to_jar(driver, jar):
+    # The reverse of apply_cookies_to_driver: clearance obtained in the
+    # browser is handed to the urllib opener.
+    copied = 0
+    for item in driver.get_cookies():
+        domain = item.get("domain") or ""
+        expiry = item.get("expiry")
+        jar.set_cookie(
+            http.cookiejar.Cookie(
+                version=0,
+                name=item["name"],
+                value=item["value"],
+                port=None,
+                port_specified=False,
+                domain=domain,
+                domain_specified=domain.startswith("."),
+                domain_initial_dot=domain.startswith("."),
+                path=item.get("path") or "/",
+                path_specified=True,
+                secure=bool(item.get("secure")),
+                expires=int(expiry) if expiry else None,
+                discard=not expiry,
+                comment=None,
+                comment_url=None,
+                rest={"HttpOnly": None} if item.get("httpOnly") else {},
+            )
+        )
+        copied += 1
+    return copied
+
+
+def write_cache(write, *args):
+    # A failed cache write (full disk, permissions) only costs the cache
+    # entry; the page itself was fetched fine.
+    try:
+        write(*args)
+    except OSError as exc:
+        print(f"Could not write the HTTP cache: {exc}", file=sys.stderr)
+
+
+def fetch_html_urllib(
+    url,
+    opener,
+    headers,
+    timeout,
+    retry_policy,
+    transfer=None,
+    cache=None,
+    pacer=None,
+    stream=False,
+):
+    # With stream=True (and a transfer dict) the body is parsed while it
+    # downloads; the links end up in transfer["links"] and reading stops
+    # after the listing table, so nothing is cached from such responses.
+    entry = cache.get(url) if cache is not None else None
+    if entry and cache.is_fresh(entry):
+        if transfer is not None:
+            transfer["cache"] = "fresh"
+        return cache.body(entry), entry["status"], False
+    if entry:
+        headers = dict(headers, **cache.conditional_headers(entry))
+
     last_error = None
-    for attempt in range(retries + 1):
+    last_status = None
+    kind = TRANSIENT
+    delay = 0.0
+    waited = 0.0
+    attempt = 0
+    while True:
+        attempt += 1
+        retry_after = None
         req = Request(url, headers=headers)
+        if pacer is not None:
+            pacer.wait()
+        started = time.monotonic()
         try:
             with opener.open(req, timeout=timeout) as resp:
                 status = resp.getcode()
-                html = resp.read().decode("utf-8", errors="ignore")
-            return html, status, is_blocked(html, status)
+                resp_headers = resp.headers
+                if status == 304 and entry:
+                    resp.read()
+                    html = None
+                elif stream and transfer is not None:
+                    html, parser = stream_links(resp, transfer)
+                    transfer["links"] = parser.links
+                else:
+                    html = read_body(resp, transfer)
         except HTTPError as err:
             status = err.code
+            if err.headers is not None:
+                retry_after = parse_retry_after(err.headers.get("Retry-After"))
+            if pacer is not None:
+                pacer.record(
+                    status,
+                    time.monotonic() - started,
+                    status in (403, 429, 503),
+                    retry_after,
+                )
+            if status == 304 and entry:
+                write_cache(cache.refresh, entry, err.headers)
+                if transfer is not None:
+                    transfer["cache"] = "revalidated"
+                return cache.body(entry), entry["status"], False
             body = ""
             try:
-                body = err.read().decode("utf-8", errors="ignore")
+                body = read_body(err, transfer)
             except Exception:
                 body = ""
-            if status in (403, 429, 503):
+            kind = classify_status(status, retry_after)
+            if kind == BLOCKED:
                 return body, status, True
             last_error = err
-        except URLError as err:
+            last_status = status
+            if kind == FATAL:
+                break
+        except (OSError, http.client.HTTPException) as err:
+            # URLError, timeouts and connection resets, also mid-body.
+            if pacer is not None:
+                pacer.record(latency=time.monotonic() - started, failed=True)
+            kind = TRANSIENT
             last_error = err
+        else:
+            # Outside the retried block: a local cache error is not a
+            # network failure and must not cost a refetch.
+            if html is None:
+                if pacer is not None:
+                    pacer.record(status, time.monotonic() - started)
+                write_cache(cache.refresh, entry, resp_headers)
+                if transfer is not None:
+                    transfer["cache"] = "revalidated"
+                return cache.body(entry), entry["status"], False
+            blocked = is_blocked(html, status)
+            if pacer is not None:
+                pacer.record(status, time.monotonic() - started, blocked)
+            truncated = transfer is not None and transfer.get("truncated")
+            if cache is not None and status == 200 and not blocked and not truncated:
+                write_cache(cache.put, url, html, status, resp_headers)
+            return html, status, blocked
+
+        if attempt > retry_policy.retries:
+            break
+        delay = retry_policy.next_delay(kind, delay, retry_after)
+        if waited + delay > retry_policy.budget:
+            break
+        waited += delay
+        if delay > 0:
+            time.sleep(delay)
 
-        if attempt < retries:
-            sleep_with_jitter(retry_delay, retry_jitter)
+    raise RetryExhausted(url, kind, attempt, last_status, last_error)
 
-    if last_error:
-        raise last_error
-    return "", None, True
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+async def crawl_pages_async(page_urls, fetch, concurrency, rate, burst):
+    # Fetches run in worker threads; at most `concurrency` per host are in
+    # flight and all of them draw from one politeness bucket. After the first
+    # error or block no new requests are started.
+    hosts = {urlsplit(url).netloc for url in page_urls.values()}
+    limits = {host: asyncio.Semaphore(max(1, concurrency)) for host in hosts}
+    bucket = TokenBucket(rate, burst)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency) * max(1, len(hosts)))
+
+    async def run(page, url):
+        async with limits[urlsplit(url).netloc]:
+            if stop.is_set():
+                return page, None
+            await bucket.acquire()
+            if stop.is_set():
+                return page, None
+            try:
+                result = await loop.run_in_executor(executor, fetch, url)
+            except Exception as exc:
+                stop.set()
+                return page, exc
+            if result[2]:
+                stop.set()
+            return page, result
+
+    results = {}
+    try:
+        tasks = [asyncio.ensure_future(run(page, url)) for page, url in page_urls.items()]
+        for done in asyncio.as_completed(tasks):
+            page, result = await done
+            if result is not None:
+                results[page] = result
+    finally:
+        executor.shutdown(wait=True)
+    return results
 
 
 def create_webdriver(
@@ -131,6 +930,8 @@ def create_webdriver(
     profile_directory,
     browser,
     debugger_address,
+    performance_log=False,
+    page_load_strategy="normal",
 ):
     try:
         from selenium import webdriver
@@ -179,6 +980,11 @@ def create_webdriver(
         if headless:
             edge_options.add_argument("--headless=new")
     options_list.append(("edge", edge_options))
+    if performance_log:
+        enable_performance_log(chrome_options)
+        enable_performance_log(edge_options)
+    set_page_load_strategy(chrome_options, page_load_strategy)
+    set_page_load_strategy(edge_options, page_load_strategy)
 
     last_error = None
     for browser_name, options in options_list:
@@ -225,17 +1031,7 @@ def humanize_browser(driver, min_wait, max_wait, scroll_steps):
 
 
 def wait_for_table(driver, wait_seconds):
-    try:
-        from selenium.webdriver.common.by import By
-        from selenium.webdriver.support.ui import WebDriverWait
-        from selenium.webdriver.support import expected_conditions as EC
-
-        WebDriverWait(driver, wait_seconds).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "table.enf-list-table"))
-        )
-        return True
-    except Exception:
-        return False
+    return wait_for_selector(driver, "table.enf-list-table", wait_seconds)
 
 
 def apply_cookies_to_driver(driver, cookie_jar, base_url):
@@ -270,10 +1066,30 @@ def apply_cookies_to_driver(driver, cookie_jar, base_url):
     return added
 
 
-def try_manual_unblock(driver, manual_retries, manual_wait):
+def cookie_jar_to_cdp(cookie_jar):
+    cookies = []
+    for cookie in cookie_jar:
+        item = {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path or "/",
+            "secure": bool(cookie.secure),
+        }
+        if cookie.expires:
+            item["expires"] = int(cookie.expires)
+        if cookie.has_nonstandard_attr("HttpOnly"):
+            item["httpOnly"] = True
+        cookies.append(item)
+    return cookies
+
+
+def try_manual_unblock(driver, manual_retries, manual_wait, capture=None):
+    if capture is None:
+        capture = PageCapture(driver)
     attempts = max(0, manual_retries)
     for attempt in range(attempts + 1):
-        if not is_blocked(driver.page_source, None):
+        if not is_blocked(capture.html, capture.status):
             return False
         print(
             "Blocked page detected (attempt "
@@ -284,7 +1100,8 @@ def try_manual_unblock(driver, manual_retries, manual_wait):
         input()
         if manual_wait > 0:
             time.sleep(manual_wait)
-    return is_blocked(driver.page_source, None)
+        capture.invalidate()
+    return is_blocked(capture.html, capture.status)
 
 
 def go_next_page(driver):
@@ -293,6 +1110,7 @@ def go_next_page(driver):
 
         next_icon = driver.find_element(By.CSS_SELECTOR, "ul.pagination i.fa-chevron-right")
         next_link = next_icon.find_element(By.XPATH, "./ancestor::a[1]")
+        mark_document_stale(driver)
         next_link.click()
         return True
     except Exception:
@@ -303,6 +1121,7 @@ def go_next_page(driver):
 
         active = driver.find_element(By.CSS_SELECTOR, "ul.pagination li.active")
         next_link = active.find_element(By.XPATH, "following-sibling::li/a[1]")
+        mark_document_stale(driver)
         next_link.click()
         return True
     except Exception:
@@ -321,28 +1140,49 @@ def fetch_html_selenium(
     manual_retries,
     manual_wait,
     navigate,
+    capture=None,
+    transfer=None,
+    extract_js=False,
+    keep_html=True,
 ):
+    # The page is serialized once per state change through `capture`, not on
+    # every check; the status it reports feeds is_blocked. With extract_js
+    # (and a transfer dict) the links are read in the page instead and land
+    # in transfer["links"]; the HTML is then only returned if keep_html.
+    if capture is None:
+        capture = PageCapture(driver, "table.enf-list-table")
     if navigate:
-        driver.get(url)
+        capture.reset()
+        navigate_to(driver, url)
     if manual:
-        if try_manual_unblock(driver, manual_retries, manual_wait):
-            return driver.page_source, True
+        if try_manual_unblock(driver, manual_retries, manual_wait, capture):
+            return capture.html, True
+        capture.invalidate()
 
     wait_for_table(driver, wait_seconds)
 
     if humanize:
         humanize_browser(driver, min_wait, max_wait, scroll_steps)
 
-    html = driver.page_source
-    blocked = is_blocked(html, None)
+    if extract_js and transfer is not None:
+        extracted = extract_listing_js(driver)
+        if extracted["links"] is not None:
+            # A rendered listing table is not a challenge page.
+            transfer["links"] = extracted["links"]
+            transfer["status"] = extracted["status"]
+            return (capture.html if keep_html else ""), False
+
+    html = capture.html
+    blocked = is_blocked(html, capture.status)
     if blocked and manual:
-        if try_manual_unblock(driver, manual_retries, manual_wait):
-            return driver.page_source, True
+        if try_manual_unblock(driver, manual_retries, manual_wait, capture):
+            return capture.html, True
         wait_for_table(driver, wait_seconds)
         if humanize:
             humanize_browser(driver, min_wait, max_wait, scroll_steps)
-        html = driver.page_source
-        blocked = is_blocked(html, None)
+        capture.invalidate()
+        html = capture.html
+        blocked = is_blocked(html, capture.status)
     return html, blocked
 
 
@@ -352,6 +1192,71 @@ def extract_links(html):
     return parser.links
 
 
+def extract_listing(html):
+    # Like extract_links, but None when the page has no listing table.
+    parser = InstallerLinkParser()
+    parser.feed(html)
+    return parser.links if parser.table_seen else None
+
+
+def listing_columns(pairs):
+    # [header, text] pairs -> {"listing_<header>": text}; unnamed columns
+    # (logo, buttons) are numbered.
+    columns = {}
+    for index, (header, text) in enumerate(pairs, 1):
+        key = re.sub(r"[^0-9a-z]+", "_", header.lower()).strip("_")
+        key = LISTING_COLUMN_PREFIX + (key or f"column_{index}")
+        if key in columns:
+            key = f"{key}_{index}"
+        columns[key] = text
+    return columns
+
+
+def listing_record(link):
+    # One output row per company link: name, company id and its row columns.
+    return {
+        "name": link.get("name", ""),
+        "company_id": link.get("company_id", ""),
+        **listing_columns(link.get("columns") or []),
+    }
+
+
+def listing_fieldnames(leading, records):
+    # Listing tables can differ between pages; keep every column, in the
+    # order first seen.
+    names = list(leading)
+    for record in records:
+        for key in record:
+            if key not in names:
+                names.append(key)
+    return names
+
+
+def collect_links(links, seen, rows):
+    for link in links:
+        full = urljoin("https://www.enfsolar.com", link["href"])
+        if full in seen:
+            continue
+        seen.add(full)
+        rows.append({"href": full, **listing_record(link)})
+
+
+def report_transfer(page, transfer):
+    if "cache" in transfer:
+        print(
+            f"Page {page}: served from cache ({transfer['cache']}).", file=sys.stderr
+        )
+        return
+    print(
+        f"Page {page}: {transfer.get('wire_bytes', 0)} bytes "
+        f"transferred, {transfer.get('body_bytes', 0)} decoded "
+        f"({transfer.get('encoding', 'identity')}, "
+        f"{transfer.get('charset', 'utf-8')})"
+        f"{', stopped after the table' if transfer.get('truncated') else ''}.",
+        file=sys.stderr,
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Extract ENF Solar installer links for Germany."
@@ -381,6 +1286,25 @@ def main():
         default=0.7,
         help="Extra random delay added to base delay.",
     )
+    parser.add_argument(
+        "--pacing",
+        choices=["fixed", "adaptive"],
+        default="fixed",
+        help="Fixed --delay/--jitter sleeps, or an adaptive rate that speeds "
+        "up while responses are healthy and backs off on throttling.",
+    )
+    parser.add_argument(
+        "--min-rate",
+        type=float,
+        default=DEFAULT_MIN_RATE,
+        help="Lowest request rate (per second) for --pacing adaptive.",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Hard ceiling on the request rate (per second) for --pacing adaptive.",
+    )
     parser.add_argument(
         "--retries",
         type=int,
@@ -391,13 +1315,31 @@ def main():
         "--retry-delay",
         type=float,
         default=2.0,
-        help="Base delay between retries.",
+        help="Base delay for the exponential retry backoff.",
+    )
+    parser.add_argument(
+        "--max-retry-delay",
+        type=float,
+        default=60.0,
+        help="Upper bound for a single backoff delay (Retry-After excluded).",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=float,
+        default=300.0,
+        help="Total seconds a single page may spend waiting between retries.",
     )
     parser.add_argument(
         "--retry-jitter",
         type=float,
-        default=1.0,
-        help="Extra random delay added to retry delay.",
+        default=None,
+        help="Deprecated and ignored: the backoff draws its own jitter.",
+    )
+    parser.add_argument(
+        "--dead-letter",
+        default="",
+        help="CSV for pages that failed for good "
+        "(default: <output>_dead_letter.csv, written only when needed).",
     )
     parser.add_argument(
         "--timeout",
@@ -405,11 +1347,101 @@ def main():
         default=20.0,
         help="Timeout per request in seconds.",
     )
+    parser.add_argument(
+        "--keep-alive",
+        dest="keep_alive",
+        action="store_true",
+        help="Reuse persistent HTTP connections for urllib requests.",
+    )
+    parser.add_argument(
+        "--no-keep-alive",
+        dest="keep_alive",
+        action="store_false",
+        help="Open a new connection for every urllib request.",
+    )
+    parser.set_defaults(keep_alive=True)
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds an idle keep-alive connection is kept before reconnecting.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help="Directory for the on-disk HTTP cache (disabled when empty).",
+    )
+    parser.add_argument(
+        "--max-cache-age",
+        type=float,
+        default=0.0,
+        help="Seconds a cached page is served without revalidation "
+        "(0 always revalidates with a conditional GET).",
+    )
+    parser.add_argument(
+        "--max-cache-mb",
+        type=float,
+        default=DEFAULT_MAX_CACHE_MB,
+        help="Cache size limit in MB; least recently used pages are evicted.",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default="",
+        help="Keep every fetched listing page in this raw HTML archive.",
+    )
+    parser.add_argument(
+        "--stream-parse",
+        dest="stream_parse",
+        action="store_true",
+        help="Parse urllib responses while downloading and stop after the table.",
+    )
+    parser.add_argument(
+        "--no-stream-parse",
+        dest="stream_parse",
+        action="store_false",
+        help="Always download and parse whole pages.",
+    )
+    parser.set_defaults(stream_parse=True)
+    parser.add_argument(
+        "--engine",
+        choices=["sync", "async"],
+        default="sync",
+        help="Fetch listing pages one at a time (sync) or concurrently (async).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Max concurrent requests per host with --engine async.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help="Requests per second shared by all async workers "
+        "(default: derived from --delay/--jitter).",
+    )
+    parser.add_argument(
+        "--burst",
+        type=float,
+        default=1.0,
+        help="Token bucket burst size with --engine async.",
+    )
     parser.add_argument(
         "--mode",
-        choices=["auto", "urllib", "selenium"],
+        choices=["auto", "urllib", "selenium", "cdp"],
         default="auto",
-        help="Fetch mode: urllib, selenium, or auto fallback.",
+        help="Fetch mode: urllib, selenium, auto fallback, or cdp (drive the "
+        "browser at --debugger-address over its DevTools WebSocket, without "
+        "chromedriver).",
+    )
+    parser.add_argument(
+        "--reprobe-every",
+        type=int,
+        default=3,
+        help="In auto mode, after this many clean Selenium pages hand the "
+        "browser's cookies and User-Agent to urllib and try it again "
+        "(0 disables; the interval doubles after each failed probe).",
     )
     parser.add_argument(
         "--browser",
@@ -417,6 +1449,18 @@ def main():
         default="auto",
         help="Selenium browser choice.",
     )
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=1,
+        help="With --mode selenium, load pages in this many headless browsers "
+        "on copies of --profile-template.",
+    )
+    parser.add_argument(
+        "--profile-template",
+        default=DEFAULT_PROFILE_TEMPLATE,
+        help="Chrome user data dir cloned for each --browsers instance.",
+    )
     parser.add_argument(
         "--debugger-address",
         default="",
@@ -427,6 +1471,11 @@ def main():
         default="",
         help="Override the User-Agent header.",
     )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print per-page transfer details.",
+    )
     parser.add_argument(
         "--accept-language",
         default="en-US,en;q=0.9",
@@ -445,6 +1494,36 @@ def main():
         help="Run Selenium with a visible browser.",
     )
     parser.set_defaults(headless=True)
+    parser.add_argument(
+        "--block-resources",
+        action="store_true",
+        help="Block images, fonts, stylesheets, ads and analytics in Selenium "
+        "via Chrome DevTools.",
+    )
+    parser.add_argument(
+        "--block-types",
+        default=",".join(DEFAULT_BLOCKED_TYPES),
+        help="Comma-separated resource types for --block-resources "
+        "(image, font, stylesheet, media).",
+    )
+    parser.add_argument(
+        "--block-urls",
+        default="",
+        help="Extra comma-separated URL patterns (wildcards allowed) to block.",
+    )
+    parser.add_argument(
+        "--page-load-strategy",
+        choices=["normal", "eager", "none"],
+        default="normal",
+        help="When Selenium's get() returns: after the load event (normal), "
+        "after DOMContentLoaded (eager) or right away (none).",
+    )
+    parser.add_argument(
+        "--cdp-capture",
+        action="store_true",
+        help="In Selenium mode, take the HTTP status and raw HTML from Chrome "
+        "DevTools instead of serializing the rendered page.",
+    )
     parser.add_argument(
         "--selenium-wait",
         type=float,
@@ -514,8 +1593,39 @@ def main():
         default=4,
         help="Max scroll steps for Selenium humanization.",
     )
+    parser.add_argument(
+        "--extract",
+        choices=["html", "js"],
+        default="html",
+        help="In selenium and cdp modes, read the links with JavaScript in the "
+        "page instead of transferring and parsing its HTML.",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        nargs="?",
+        const=default_parse_workers(),
+        default=0,
+        help="Parse pages in N worker processes (default: cores - 1) while the "
+        "next pages are fetched; 0 parses inline.",
+    )
+    parser.add_argument(
+        "--db",
+        default="",
+        help="Upsert the links into this SQLite database instead of writing "
+        "--output.",
+    )
 
     args = parser.parse_args()
+    if args.browsers > 1 and (
+        args.mode != "selenium" or args.manual or args.paginate or args.debugger_address
+    ):
+        # Manual unblocking and Next-button pagination need one visible
+        # browser; the urllib fallback and probing hand over a single session.
+        parser.error(
+            "--browsers needs --mode selenium, without --manual, --paginate "
+            "or --debugger-address."
+        )
 
     random.seed()
     cookie_file = args.cookie_file.strip()
@@ -531,10 +1641,11 @@ def main():
                 file=sys.stderr,
             )
     explicit_ua = args.user_agent.strip()
+    saved_ua = load_user_agent(cookie_file) if cookie_file else ""
     if explicit_ua:
         urllib_user_agent = explicit_ua
     elif cookie_file:
-        urllib_user_agent = DEFAULT_UA
+        urllib_user_agent = saved_ua or DEFAULT_UA
     else:
         urllib_user_agent = random.choice(USER_AGENTS)
     if explicit_ua:
@@ -544,18 +1655,48 @@ def main():
     elif args.user_data_dir:
         selenium_user_agent = ""
     elif cookie_file:
-        selenium_user_agent = DEFAULT_UA
+        selenium_user_agent = saved_ua or DEFAULT_UA
     else:
         selenium_user_agent = urllib_user_agent
     headers = {
         "User-Agent": urllib_user_agent,
         "Accept-Language": args.accept_language,
+        "Accept-Encoding": accept_encoding(),
         "Referer": "https://www.enfsolar.com/",
     }
-    opener, opener_jar = make_opener()
+    if args.keep_alive:
+        opener, opener_jar = make_pooled_opener(args.idle_timeout)
+    else:
+        opener, opener_jar = make_opener()
     if cookie_jar:
         for c in cookie_jar:
             opener_jar.set_cookie(c)
+    cache = open_cache(args.cache_dir, args.max_cache_age, args.max_cache_mb)
+    archive = open_archive(args.archive_dir)
+    pacer = make_pacer(
+        args.pacing, args.delay, args.jitter, args.min_rate, args.max_rate
+    )
+    # Cached and archived pages must be complete, so no early stop for them.
+    stream = args.stream_parse and cache is None and archive is None
+    if args.retry_jitter is not None:
+        print(
+            "--retry-jitter is deprecated and ignored; the retry backoff is "
+            "jittered already (see --retry-delay and --max-retry-delay).",
+            file=sys.stderr,
+        )
+    retry_policy = RetryPolicy(
+        args.retries, args.retry_delay, args.max_retry_delay, args.retry_budget
+    )
+    dead_letters = []
+    if args.engine == "async":
+        if args.keep_alive:
+            opener = ThreadLocalOpener(
+                lambda: ConnectionPool(opener_jar, idle_timeout=args.idle_timeout)
+            )
+        else:
+            opener = ThreadLocalOpener(
+                lambda: build_opener(HTTPCookieProcessor(opener_jar))
+            )
 
     seen = set()
     rows = []
@@ -563,21 +1704,310 @@ def main():
     use_selenium = args.mode == "selenium"
     cookies_applied = False
     selenium_page = None
+    selenium_streak = 0
+    reprobe_every = args.reprobe_every
+    probing = False
+    cdp = None
+    browser_pool = None
+    pooled = None
+    wire_total = 0
+    body_total = 0
+    prefetched = {}
+    parse_pool = None
+    if args.parse_workers > 0:
+        parse_pool = ParsePool(args.parse_workers, extract_links)
+    store = open_store(args.db)
+
+    def collect(links):
+        start = len(rows)
+        collect_links(links, seen, rows)
+        if store is not None:
+            for row in rows[start:]:
+                store.upsert(row)
+
+    def add_links(page, html, links):
+        # With --parse-workers the page is parsed while the next one is
+        # fetched; links are still collected in page order.
+        if parse_pool is None:
+            if links is None:
+                links = extract_links(html)
+            collect(links)
+            return
+        if links is not None:
+            parse_pool.done(page, links)
+        else:
+            parse_pool.put(page, html)
+        for _, parsed in parse_pool.ready():
+            collect(parsed)
+
+    def fetch_for_engine(url):
+        transfer = {}
+        html, status, blocked = fetch_html_urllib(
+            url,
+            opener,
+            headers,
+            args.timeout,
+            retry_policy,
+            transfer,
+            cache,
+            pacer,
+            stream,
+        )
+        return html, status, blocked, transfer
+
+    def start_webdriver():
+        new_driver = create_webdriver(
+            selenium_user_agent,
+            args.headless,
+            args.user_data_dir,
+            args.profile_directory,
+            args.browser,
+            args.debugger_address,
+            performance_log=args.block_resources or args.cdp_capture,
+            page_load_strategy=args.page_load_strategy,
+        )
+        if args.block_resources:
+            enable_resource_blocking(
+                new_driver, parse_list(args.block_types), parse_list(args.block_urls)
+            )
+        return new_driver
+
+    def start_pool_browser(profile_dir):
+        new_driver = create_webdriver(
+            selenium_user_agent,
+            True,
+            profile_dir,
+            "",
+            args.browser,
+            "",
+            performance_log=args.block_resources,
+            page_load_strategy=args.page_load_strategy,
+        )
+        if args.block_resources:
+            enable_resource_blocking(
+                new_driver, parse_list(args.block_types), parse_list(args.block_urls)
+            )
+        if cookie_jar:
+            apply_cookies_to_driver(new_driver, cookie_jar, DEFAULT_HOME_URL)
+        return new_driver
+
+    def switch_to_selenium():
+        nonlocal driver, use_selenium, cookies_applied
+        use_selenium = True
+        if driver is None:
+            driver = start_webdriver()
+        if cookie_jar and not cookies_applied:
+            applied = apply_cookies_to_driver(driver, cookie_jar, DEFAULT_HOME_URL)
+            cookies_applied = True
+            if applied:
+                print(f"Loaded {applied} cookies into Selenium.", file=sys.stderr)
+
+    def hand_back_to_urllib():
+        copied = driver_cookies_to_jar(driver, opener_jar)
+        try:
+            user_agent = driver.execute_script("return navigator.userAgent;")
+        except Exception:
+            user_agent = ""
+        if user_agent:
+            # Clearance cookies are bound to the browser's User-Agent.
+            headers["User-Agent"] = user_agent
+        save_path = cookie_file or DEFAULT_COOKIE_FILE
+        try:
+            save_cookie_jar(opener_jar, save_path)
+            if user_agent:
+                save_user_agent(user_agent, save_path)
+        except OSError as exc:
+            print(f"Could not save cookies to {save_path}: {exc}", file=sys.stderr)
+        print(
+            f"Copied {copied} browser cookies to urllib; re-probing it.",
+            file=sys.stderr,
+        )
+
+    def fetch_with_selenium(url, navigate, transfer=None):
+        if transfer is not None:
+            # Drop whatever a failed urllib attempt left for this page.
+            transfer.pop("links", None)
+        if pacer is not None and navigate:
+            pacer.wait()
+        started = time.monotonic()
+        capture = PageCapture(
+            driver,
+            "table.enf-list-table",
+            network=args.cdp_capture,
+            performance_log=args.block_resources,
+        )
+        html, blocked = fetch_html_selenium(
+            url,
+            driver,
+            args.selenium_wait,
+            args.humanize,
+            args.human_min_wait,
+            args.human_max_wait,
+            args.scroll_steps,
+            args.manual,
+            args.manual_retries,
+            args.manual_wait,
+            navigate,
+            capture,
+            transfer,
+            args.extract == "js",
+            archive is not None,
+        )
+        if pacer is not None:
+            if transfer and "status" in transfer:
+                status = transfer["status"]
+            else:
+                status = capture.status
+            pacer.record(
+                status=status,
+                latency=time.monotonic() - started,
+                blocked=blocked,
+            )
+        if args.block_resources:
+            network = capture.network_stats()
+            if args.verbose:
+                print(f"{url}: {format_network_stats(network)}.", file=sys.stderr)
+        return html, blocked
 
     try:
+        if args.mode == "cdp":
+            cdp = CDPSession(args.debugger_address or DEFAULT_DEBUGGER_ADDRESS)
+            # Same readiness point as the Selenium page-load strategies.
+            if args.page_load_strategy == "normal":
+                cdp_wait_until = "load"
+            else:
+                cdp_wait_until = "DOMContentLoaded"
+            if cookie_jar:
+                cdp.set_cookies(cookie_jar_to_cdp(cookie_jar))
+        if args.engine == "async" and args.mode in ("auto", "urllib"):
+            rate = args.rate
+            if rate <= 0:
+                rate = 1.0 / max(0.05, args.delay + args.jitter / 2.0)
+            if pacer is not None:
+                # The adaptive pacer already spaces requests inside the
+                # workers; the bucket would only add a second, fixed limit.
+                rate = 0.0
+            page_urls = {
+                page: args.base_url.format(page=page)
+                for page in range(args.start, args.end + 1)
+            }
+            results = asyncio.run(
+                crawl_pages_async(
+                    page_urls, fetch_for_engine, args.concurrency, rate, args.burst
+                )
+            )
+            # Only clean pages are kept; failed, blocked and skipped pages go
+            # through the sequential loop below (and its Selenium fallback).
+            unparsed = {}
+            for page in sorted(results):
+                result = results[page]
+                if isinstance(result, RetryExhausted) and args.mode == "urllib":
+                    dead_letters.append(result)
+                    prefetched[page] = []
+                    continue
+                if isinstance(result, Exception) or result[2]:
+                    continue
+                html, status, blocked, transfer = result
+                wire_total += transfer.get("wire_bytes", 0)
+                body_total += transfer.get("body_bytes", 0)
+                if args.verbose:
+                    report_transfer(page, transfer)
+                if archive is not None and "cache" not in transfer:
+                    archive.add(page_urls[page], html, "listing", status)
+                if transfer.get("links") is not None:
+                    prefetched[page] = transfer["links"]
+                else:
+                    unparsed[page] = html
+            del results
+            if parse_pool is not None:
+                prefetched.update(parse_pool.map(unparsed.items()))
+            else:
+                for page, html in unparsed.items():
+                    prefetched[page] = extract_links(html)
+            del unparsed
+
+        if args.browsers > 1:
+            # Each instance spaces its own loads; the pacer caps them all.
+            browser_pool = BrowserPool(
+                args.browsers,
+                start_pool_browser,
+                "table.enf-list-table",
+                capture_selector="table.enf-list-table",
+                template=args.profile_template,
+                timeout=args.selenium_wait,
+                pacer=pacer,
+                delay=(args.delay, args.delay + args.jitter),
+                is_blocked=is_blocked,
+            )
+            pooled = browser_pool.fetch(
+                (page, args.base_url.format(page=page))
+                for page in range(args.start, args.end + 1)
+            )
+
         for page in range(args.start, args.end + 1):
             url = args.base_url.format(page=page)
-            if not use_selenium:
+            if page in prefetched:
+                add_links(page, None, prefetched.pop(page))
+                continue
+            transfer = {}
+            if pooled is not None:
+                _, result = next(pooled)
+                html = result["html"]
+                if result["blocked"]:
+                    raise RuntimeError(
+                        f"Blocked on page {page}. "
+                        "Try --user-data-dir or a warmer --profile-template."
+                    )
+                if not result["ready"]:
+                    raise RuntimeError(
+                        f"Page {page} did not load in any browser "
+                        f"({result.get('error') or 'timed out'}); resume with "
+                        f"--start {page}."
+                    )
+            elif cdp is not None:
+                if pacer is not None:
+                    pacer.wait()
+                started = time.monotonic()
+                html, blocked = fetch_html_cdp(
+                    cdp,
+                    url,
+                    "table.enf-list-table",
+                    cdp_wait_until,
+                    args.timeout,
+                    is_blocked,
+                    transfer,
+                    args.extract == "js",
+                    archive is not None,
+                )
+                status = transfer["status"]
+                if pacer is not None:
+                    pacer.record(
+                        status=status,
+                        latency=time.monotonic() - started,
+                        blocked=blocked,
+                    )
+                if blocked:
+                    raise RuntimeError(
+                        f"Blocked on page {page} (status {status}). Clear the "
+                        "challenge in the attached browser and resume with --start."
+                    )
+            elif not use_selenium:
                 try:
                     html, status, blocked = fetch_html_urllib(
                         url,
                         opener,
                         headers,
                         args.timeout,
-                        args.retries,
-                        args.retry_delay,
-                        args.retry_jitter,
+                        retry_policy,
+                        transfer,
+                        cache,
+                        pacer,
+                        stream,
                     )
+                    wire_total += transfer.get("wire_bytes", 0)
+                    body_total += transfer.get("body_bytes", 0)
+                    if args.verbose:
+                        report_transfer(page, transfer)
                 except Exception as exc:
                     if args.mode == "auto":
                         print(
@@ -585,40 +2015,20 @@ def main():
                             "Switching to Selenium.",
                             file=sys.stderr,
                         )
-                        use_selenium = True
-                        driver = create_webdriver(
-                            selenium_user_agent,
-                            args.headless,
-                            args.user_data_dir,
-                            args.profile_directory,
-                            args.browser,
-                            args.debugger_address,
-                        )
-                        if cookie_jar and not cookies_applied:
-                            applied = apply_cookies_to_driver(
-                                driver, cookie_jar, DEFAULT_HOME_URL
-                            )
-                            cookies_applied = True
-                            if applied:
-                                print(
-                                    f"Loaded {applied} cookies into Selenium.",
-                                    file=sys.stderr,
-                                )
+                        if probing:
+                            reprobe_every *= 2
+                        probing = False
+                        switch_to_selenium()
                         navigate = True
-                        html, blocked = fetch_html_selenium(
-                            url,
-                            driver,
-                            args.selenium_wait,
-                            args.humanize,
-                            args.human_min_wait,
-                            args.human_max_wait,
-                            args.scroll_steps,
-                            args.manual,
-                            args.manual_retries,
-                            args.manual_wait,
-                            navigate,
-                        )
+                        html, blocked = fetch_with_selenium(url, navigate, transfer)
                         selenium_page = page
+                    elif isinstance(exc, RetryExhausted):
+                        print(
+                            f"Giving up on page {page}: {exc}.",
+                            file=sys.stderr,
+                        )
+                        dead_letters.append(exc)
+                        continue
                     else:
                         raise
 
@@ -628,82 +2038,31 @@ def main():
                         "Switching to Selenium.",
                         file=sys.stderr,
                     )
-                    use_selenium = True
-                    driver = create_webdriver(
-                        selenium_user_agent,
-                        args.headless,
-                        args.user_data_dir,
-                        args.profile_directory,
-                        args.browser,
-                        args.debugger_address,
-                    )
-                    if cookie_jar and not cookies_applied:
-                        applied = apply_cookies_to_driver(
-                            driver, cookie_jar, DEFAULT_HOME_URL
-                        )
-                        cookies_applied = True
-                        if applied:
-                            print(
-                                f"Loaded {applied} cookies into Selenium.",
-                                file=sys.stderr,
-                            )
+                    if probing:
+                        reprobe_every *= 2
+                    probing = False
+                    switch_to_selenium()
                     navigate = True
-                    html, blocked = fetch_html_selenium(
-                        url,
-                        driver,
-                        args.selenium_wait,
-                        args.humanize,
-                        args.human_min_wait,
-                        args.human_max_wait,
-                        args.scroll_steps,
-                        args.manual,
-                        args.manual_retries,
-                        args.manual_wait,
-                        navigate,
-                    )
+                    html, blocked = fetch_with_selenium(url, navigate, transfer)
                     selenium_page = page
                 elif blocked:
                     raise RuntimeError(
                         f"Blocked on page {page} (status {status}). "
                         "Try --mode selenium."
                     )
+                elif probing:
+                    print(f"urllib works again from page {page}.", file=sys.stderr)
+                    reprobe_every = args.reprobe_every
+                    probing = False
             else:
-                if driver is None:
-                    driver = create_webdriver(
-                        selenium_user_agent,
-                        args.headless,
-                        args.user_data_dir,
-                        args.profile_directory,
-                        args.browser,
-                        args.debugger_address,
-                    )
-                if cookie_jar and not cookies_applied:
-                    applied = apply_cookies_to_driver(
-                        driver, cookie_jar, DEFAULT_HOME_URL
-                    )
-                    cookies_applied = True
-                    if applied:
-                        print(
-                            f"Loaded {applied} cookies into Selenium.",
-                            file=sys.stderr,
-                        )
+                switch_to_selenium()
                 navigate = True
                 if args.paginate and selenium_page is not None and page == selenium_page + 1:
+                    if pacer is not None:
+                        pacer.wait()
                     if go_next_page(driver):
                         navigate = False
-                html, blocked = fetch_html_selenium(
-                    url,
-                    driver,
-                    args.selenium_wait,
-                    args.humanize,
-                    args.human_min_wait,
-                    args.human_max_wait,
-                    args.scroll_steps,
-                    args.manual,
-                    args.manual_retries,
-                    args.manual_wait,
-                    navigate,
-                )
+                html, blocked = fetch_with_selenium(url, navigate, transfer)
                 selenium_page = page
                 if blocked:
                     if args.manual:
@@ -715,23 +2074,83 @@ def main():
                         f"Blocked on page {page}. "
                         "Try --manual and/or --user-data-dir."
                     )
-
-            links = extract_links(html)
-            for link in links:
-                full = urljoin("https://www.enfsolar.com", link)
-                if full in seen:
-                    continue
-                seen.add(full)
-                rows.append([full])
-
-            sleep_with_jitter(args.delay, args.jitter)
+                if args.mode == "auto" and reprobe_every > 0:
+                    selenium_streak += 1
+                    if selenium_streak >= reprobe_every:
+                        hand_back_to_urllib()
+                        selenium_streak = 0
+                        use_selenium = False
+                        probing = True
+
+            if archive is not None and "cache" not in transfer:
+                archive.add(url, html, "listing")
+            add_links(page, html, transfer.get("links"))
+
+            if pacer is None:
+                sleep_with_jitter(args.delay, args.jitter)
+            elif args.verbose:
+                print(
+                    f"Page {page}: pacing at {pacer.current_rate():.2f} req/s.",
+                    file=sys.stderr,
+                )
+        if parse_pool is not None:
+            for _, parsed in parse_pool.drain():
+                collect(parsed)
     finally:
+        if parse_pool is not None:
+            parse_pool.close()
+        if store is not None:
+            store.close()
+        if browser_pool is not None:
+            if browser_pool.restarts():
+                print(
+                    f"Restarted {browser_pool.restarts()} crashed or stuck browsers",
+                    file=sys.stderr,
+                )
+            browser_pool.close()
         if driver is not None:
             driver.quit()
+        if cdp is not None:
+            cdp.close()
+        if dead_letters:
+            dead_letter_path = args.dead_letter or (
+                os.path.splitext(args.output)[0] + "_dead_letter.csv"
+            )
+            write_dead_letters(dead_letter_path, dead_letters)
+            print(
+                f"Wrote {len(dead_letters)} failed pages to {dead_letter_path}",
+                file=sys.stderr,
+            )
+        if pacer is not None:
+            print(
+                f"Adaptive pacing: final rate {pacer.current_rate():.2f} req/s "
+                f"after {pacer.backoffs} back-offs.",
+                file=sys.stderr,
+            )
+        if wire_total:
+            print(
+                f"Transferred {wire_total} bytes for {body_total} bytes of HTML.",
+                file=sys.stderr,
+            )
+        pool_stats = getattr(opener, "stats", None)
+        if pool_stats is not None:
+            opener.close()
+            print(
+                f"Connection pool: {pool_stats['requests']} requests, "
+                f"{pool_stats['reused']} reused, "
+                f"{pool_stats['connections']} connections opened, "
+                f"{pool_stats['reconnects']} reconnects.",
+                file=sys.stderr,
+            )
 
+    if store is not None:
+        print(f"Upserted {len(rows)} links into {args.db}")
+        return
     with open(args.output, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["href"])
+        writer = csv.DictWriter(
+            f, fieldnames=listing_fieldnames(["href"], rows), restval=""
+        )
+        writer.writeheader()
         writer.writerows(rows)
 
     print(f"Wrote {len(rows)} links to {args.output}")
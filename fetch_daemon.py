@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import argparse
+import http.cookiejar
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from extract_enf_installers import (
+    DEFAULT_COOKIE_FILE,
+    driver_cookies_to_jar,
+    save_cookie_jar,
+    save_user_agent,
+)
+from rate_control import DEFAULT_MAX_RATE, DEFAULT_MIN_RATE, AdaptiveRateController
+from tab_pool import TabPool
+
+
+CHROMEDRIVER_PATH = Path("drivers/chromedriver.exe")
+DEBUGGER_ADDRESS = "127.0.0.1:9222"
+DEFAULT_TCP_ADDRESS = "127.0.0.1:9334"
+if hasattr(socket, "AF_UNIX") and os.name != "nt":
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), "enf-fetch.sock")
+else:
+    DEFAULT_ADDRESS = DEFAULT_TCP_ADDRESS
+BLOCK_STATUSES = (403, 429, 503)
+
+
+def parse_address(value):
+    # "host:port" is TCP; anything else is a Unix socket path.
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and os.path.sep not in host:
+        return (host or "127.0.0.1", int(port))
+    return value
+
+
+def connect(address, timeout=5.0):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address, timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    sock.settimeout(None)
+    return sock
+
+
+# Owns the warm browser: one attached WebDriver session, its tab pool, the
+# adaptive rate controller, which keeps its learned rate between runs, and
+# the session's cookie jar. The jar and the browser's User-Agent are saved
+# to cookie_file after every fetch request, the way hand_back_to_urllib()
+# does, so urllib paths (--refresh, extract_enf_installers) share the
+# clearance. Requests from different clients are served one at a time.
+class FetchService:
+    def __init__(self, driver, tabs, pacer, delay, cookie_file=DEFAULT_COOKIE_FILE):
+        self.driver = driver
+        self.pacer = pacer
+        self.cookie_file = cookie_file
+        self.pool = TabPool(driver, tabs, "body", pacer=pacer, delay=delay)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.served = 0
+
+    def fetch(self, request):
+        phrases = request.get("block_phrases") or []
+
+        def is_blocked(html, status):
+            return status in BLOCK_STATUSES or any(p in html for p in phrases)
+
+        with self.lock:
+            self.pool.ready_selector = request.get("ready", "body")
+            self.pool.capture_selector = request.get("capture")
+            self.pool.timeout = float(request.get("timeout", 15))
+            self.pool.is_blocked = is_blocked
+            try:
+                for index, result in self.pool.fetch(enumerate(request["urls"])):
+                    self.served += 1
+                    yield dict(result, index=index)
+                    if result["blocked"] and request.get("stop_on_block", True):
+                        return
+            finally:
+                # Also when the client went away mid-stream.
+                try:
+                    self._save_cookies(self.cookie_file)
+                except Exception as exc:
+                    print(f"Could not save cookies: {exc}", file=sys.stderr)
+
+    def _save_cookies(self, path):
+        jar = http.cookiejar.CookieJar()
+        copied = driver_cookies_to_jar(self.driver, jar)
+        save_cookie_jar(jar, path)
+        user_agent = self.driver.execute_script("return navigator.userAgent;")
+        if user_agent:
+            # Clearance cookies are bound to the browser's User-Agent.
+            save_user_agent(user_agent, path)
+        return copied
+
+    def save_cookies(self, path=None):
+        with self.lock:
+            path = path or self.cookie_file
+            return path, self._save_cookies(path)
+
+    def status(self):
+        return {
+            "uptime": time.time() - self.started,
+            "served": self.served,
+            "tabs": len(self.pool.handles),
+            "rate": self.pacer.current_rate() if self.pacer else None,
+            "backoffs": self.pacer.backoffs if self.pacer else 0,
+        }
+
+    def close(self):
+        self.pool.close()
+        self.driver.quit()
+
+
+class FetchHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line; results stream back one JSON line each,
+    # followed by {"done": true}.
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.send({"error": "invalid JSON", "done": True})
+                continue
+            op = request.get("op")
+            try:
+                if op == "fetch":
+                    for result in service.fetch(request):
+                        self.send(result)
+                    self.send({"done": True})
+                elif op == "cookies":
+                    path, count = service.save_cookies(request.get("path"))
+                    self.send({"path": path, "count": count, "done": True})
+                elif op == "status":
+                    self.send(dict(service.status(), done=True))
+                elif op == "stop":
+                    self.send({"done": True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                else:
+                    self.send({"error": f"unknown op {op!r}", "done": True})
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away (e.g. it stopped on a block).
+                return
+            except Exception as exc:
+                self.send({"error": str(exc), "done": True})
+
+
+class FetchClient:
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.sock = connect(address)
+        self._reader = self.sock.makefile("rb")
+
+    def _request(self, message):
+        self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        while True:
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionError("Fetch daemon closed the connection")
+            reply = json.loads(line)
+            if reply.get("error"):
+                raise RuntimeError(f"Fetch daemon: {reply['error']}")
+            yield reply
+            if reply.get("done"):
+                return
+
+    def fetch(self, jobs, ready="body", capture=None, block_phrases=(), timeout=15):
+        # Same contract as TabPool.fetch: (key, url) in, (key, result) out, in
+        # order. A blocked result ends the stream.
+        jobs = list(jobs)
+        request = {
+            "op": "fetch",
+            "urls": [url for _, url in jobs],
+            "ready": ready,
+            "capture": capture,
+            "block_phrases": list(block_phrases),
+            "timeout": timeout,
+        }
+        for reply in self._request(request):
+            if reply.get("done"):
+                return
+            yield jobs[reply["index"]][0], reply
+
+    def save_cookies(self, path=None):
+        # Has the daemon write its jar (and UA) to path, or to its own
+        # --cookie-file; returns (path, cookie count).
+        reply = next(self._request({"op": "cookies", "path": path}))
+        return reply["path"], reply["count"]
+
+    def status(self):
+        return next(self._request({"op": "status"}))
+
+    def stop(self):
+        list(self._request({"op": "stop"}))
+
+    def close(self):
+        self._reader.close()
+        self.sock.close()
+
+
+def start_attached_driver(debugger_address, chromedriver):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.add_experimental_option("debuggerAddress", debugger_address)
+    # Tabs are polled, so get() never has to wait for the load event.
+    options.page_load_strategy = "none"
+    if chromedriver and Path(chromedriver).exists():
+        service = Service(str(chromedriver))
+    else:
+        service = Service()
+    return webdriver.Chrome(service=service, options=options)
+
+
+def make_server(address, service):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(address, FetchHandler)
+    else:
+        if os.path.exists(address):
+            try:
+                connect(address, timeout=1.0).close()
+            except OSError:
+                os.unlink(address)  # left behind by a daemon that died
+            else:
+                raise RuntimeError(f"A fetch daemon is already listening on {address}")
+        server = socketserver.ThreadingUnixStreamServer(address, FetchHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(args):
+    pacer = AdaptiveRateController(
+        initial_rate=1.0 / max(0.05, args.delay),
+        min_rate=args.min_rate,
+        max_rate=args.max_rate,
+    )
+    driver = start_attached_driver(args.debugger_address, args.chromedriver)
+    service = FetchService(
+        driver, args.tabs, pacer, (args.delay, args.delay), args.cookie_file
+    )
+    server = make_server(args.address, service)
+    print(f"Fetch daemon listening on {args.address} ({args.tabs} tabs)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not isinstance(parse_address(args.address), tuple):
+            try:
+                os.unlink(args.address)
+            except OSError:
+                pass
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep one warm, attached browser serving fetches for the "
+        "ENF scrapers over a local socket."
+    )
+    parser.add_argument("command", choices=["serve", "status", "stop"])
+    parser.add_argument(
+        "--address",
+        default=DEFAULT_ADDRESS,
+        help="Unix socket path, or host:port for TCP (the default on Windows).",
+    )
+    parser.add_argument("--debugger-address", default=DEBUGGER_ADDRESS)
+    parser.add_argument("--chromedriver", default=str(CHROMEDRIVER_PATH))
+    parser.add_argument("--tabs", type=int, default=1, help="Tabs to load in parallel.")
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=1.5,
+        help="Starting gap in seconds between page loads (adapts from there).",
+    )
+    parser.add_argument(
+        "--cookie-file",
+        default=DEFAULT_COOKIE_FILE,
+        help="Netscape cookie file the browser's cookies are saved to after "
+        "each fetch request, for the urllib paths.",
+    )
+    parser.add_argument("--min-rate", type=float, default=DEFAULT_MIN_RATE)
+    parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+        return
+    try:
+        client = FetchClient(args.address)
+    except OSError:
+        print(f"No fetch daemon on {args.address}.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        if args.command == "status":
+            status = client.status()
+            print(
+                f"Up {status['uptime']:.0f}s, {status['served']} pages served, "
+                f"{status['tabs']} tabs, rate {status['rate']:.2f}/s "
+                f"({status['backoffs']} back-offs)"
+            )
+        else:
+            client.stop()
+            print("Fetch daemon stopped.")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
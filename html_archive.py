@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+INDEX_FILE = "index.jsonl"
+
+
+# Append-only archive of raw fetched pages. Bodies are stored once per
+# content hash under objects/; index.jsonl records every fetch (url, kind,
+# time, status, hash) so a page can be looked up by URL and fetch time.
+class HtmlArchive:
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(archive_dir, "objects"), exist_ok=True)
+
+    def _object_path(self, digest, codec):
+        suffix = ".html.zst" if codec == "zstd" else ".html.gz"
+        return os.path.join(self.archive_dir, "objects", digest[:2], digest + suffix)
+
+    def add(self, url, html, kind, status=None, fetched_at=None):
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        codec = "zstd" if zstandard is not None else "gzip"
+        path = self._object_path(digest, codec)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if codec == "zstd":
+                blob = zstandard.ZstdCompressor(level=10).compress(data)
+            else:
+                blob = gzip.compress(data, compresslevel=9)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+
+        record = {
+            "url": url,
+            "kind": kind,
+            "fetched_at": fetched_at if fetched_at is not None else time.time(),
+            "status": status,
+            "sha256": digest,
+            "codec": codec,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return record
+
+    def records(self, kind=None, latest_only=True):
+        latest = {}
+        result = []
+        try:
+            f = open(self.index_path, encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if kind and record.get("kind") != kind:
+                    continue
+                if not latest_only:
+                    result.append(record)
+                    continue
+                previous = latest.get(record["url"])
+                if previous is None or record["fetched_at"] >= previous["fetched_at"]:
+                    latest[record["url"]] = record
+        if latest_only:
+            result = sorted(latest.values(), key=lambda r: r["fetched_at"])
+        return result
+
+    def read(self, record):
+        path = self._object_path(record["sha256"], record.get("codec", "gzip"))
+        with open(path, "rb") as f:
+            blob = f.read()
+        if record.get("codec") == "zstd":
+            if zstandard is None:
+                raise RuntimeError(
+                    "This archive uses zstd. Install it with: pip install zstandard"
+                )
+            data = zstandard.ZstdDecompressor().decompress(blob)
+        else:
+            data = gzip.decompress(blob)
+        return data.decode("utf-8")
+
+
+def open_archive(archive_dir):
+    if not archive_dir:
+        return None
+    return HtmlArchive(archive_dir)
@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+DEFAULT_MAX_CACHE_MB = 512
+
+
+# On-disk response cache shared by the three scrapers. Each URL gets a small
+# JSON metadata file (validators, timestamps) and a gzip-compressed body.
+class ResponseCache:
+    def __init__(
+        self, cache_dir, max_age=0.0, max_bytes=DEFAULT_MAX_CACHE_MB * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        self.max_age = max(0.0, max_age)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total = sum(size for _, size, _ in self._scan())
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = os.path.join(self.cache_dir, key[:2])
+        meta_path = os.path.join(folder, key + ".json")
+        return meta_path, os.path.join(folder, key + ".html.gz")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(root, name)
+                body_path = meta_path[: -len(".json")] + ".html.gz"
+                try:
+                    with open(meta_path, encoding="utf-8") as f:
+                        accessed = json.load(f).get("accessed", 0.0)
+                    size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+                except (OSError, ValueError):
+                    continue
+                yield meta_path, size, accessed
+
+    def _write_meta(self, meta_path, entry):
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, meta_path)
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        if not entry or self.max_age <= 0:
+            return False
+        return time.time() - entry.get("stored_at", 0.0) <= self.max_age
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body(self, entry):
+        _, body_path = self._paths(entry["url"])
+        with gzip.open(body_path, "rb") as f:
+            html = f.read().decode("utf-8")
+        entry["accessed"] = time.time()
+        self._write_meta(self._paths(entry["url"])[0], entry)
+        return html
+
+    def put(self, url, html, status=200, headers=None):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        old_size = 0
+        if os.path.exists(meta_path) and os.path.exists(body_path):
+            old_size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+
+        tmp_path = body_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(html.encode("utf-8"), compresslevel=6))
+        os.replace(tmp_path, body_path)
+
+        now = time.time()
+        entry = {
+            "url": url,
+            "status": status,
+            "etag": headers.get("ETag", "") if headers else "",
+            "last_modified": headers.get("Last-Modified", "") if headers else "",
+            "stored_at": now,
+            "accessed": now,
+        }
+        self._write_meta(meta_path, entry)
+        size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+        with self._lock:
+            self._total += size - old_size
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+        return entry
+
+    def refresh(self, entry, headers=None):
+        # A 304 keeps the body; only the validators and timestamps move.
+        if headers is not None:
+            entry["etag"] = headers.get("ETag") or entry.get("etag", "")
+            entry["last_modified"] = headers.get("Last-Modified") or entry.get(
+                "last_modified", ""
+            )
+        entry["stored_at"] = time.time()
+        self._write_meta(self._paths(entry["url"])[0], entry)
+
+    def evict(self):
+        # Least recently used entries go first, down to 90% of the limit so
+        # the next few stores do not trigger another scan.
+        with self._lock:
+            target = int(self.max_bytes * 0.9)
+            entries = sorted(self._scan(), key=lambda item: item[2])
+            total = sum(size for _, size, _ in entries)
+            for meta_path, size, _ in entries:
+                if total <= target:
+                    break
+                body_path = meta_path[: -len(".json")] + ".html.gz"
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+            self._total = total
+
+
+def open_cache(cache_dir, max_age, max_cache_mb=DEFAULT_MAX_CACHE_MB):
+    if not cache_dir:
+        return None
+    return ResponseCache(
+        cache_dir, max_age=max_age, max_bytes=int(max_cache_mb * 1024 * 1024)
+    )
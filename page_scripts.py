@@ -0,0 +1,110 @@
+# In-page extraction for ENF listing and detail pages. The *_FN sources are
+# plain function declarations taking a Document, so the same code runs via
+# WebDriver execute_script, CDP Runtime.evaluate and the batch fetch() path
+# (on DOMParser documents). Results mirror extract_links() and
+# extract_details(); only this small JSON crosses into Python.
+
+STRIPPED_TEXT_FN = """
+function strippedText(doc, el) {
+  const walker = doc.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+  const parts = [];
+  while (walker.nextNode()) {
+    const part = walker.currentNode.nodeValue.trim();
+    if (part) parts.push(part);
+  }
+  return parts.join("");
+}
+"""
+
+# null when the listing table is missing (block page, empty result page),
+# so the caller can fall back to the full HTML and its usual checks. Links in
+# the table also carry their row as [header, text] pairs, like
+# InstallerLinkParser.
+EXTRACT_LISTING_FN = """
+function collapsedText(el) {
+  return el.textContent.split(/\\s+/).filter(Boolean).join(" ");
+}
+
+function extractListing(doc) {
+  const table = doc.querySelector("table.enf-list-table");
+  if (!table || !table.querySelector("tbody")) return null;
+  const headers = Array.from(table.querySelectorAll("thead th"), collapsedText);
+  // Links with their own id, or inside a listing row that carries one.
+  const links = doc.querySelectorAll(
+    "a.mkjs-a[data-company-id][href], " +
+      "table.enf-list-table tbody tr[data-company-id] a.mkjs-a[href]"
+  );
+  return Array.from(links, (a) => {
+    const row = a.closest("tbody tr");
+    const cells = row && row.closest("table") === table ? Array.from(row.cells) : [];
+    return {
+      href: a.getAttribute("href"),
+      name: strippedText(doc, a),
+      company_id:
+        a.getAttribute("data-company-id") ||
+        (row ? row.getAttribute("data-company-id") || "" : ""),
+      columns: cells.map((cell, i) => [headers[i] || "", collapsedText(cell)]),
+    };
+  });
+}
+"""
+
+EXTRACT_DETAILS_FN = """
+function extractDetails(doc) {
+  const web = doc.querySelector("a[itemprop='url'][href]");
+  const tel = doc.querySelector("td[itemprop='telephone']");
+  const telLink = tel ? tel.querySelector("a[href]") : null;
+  const addr = doc.querySelector("td[itemprop='address']");
+  return {
+    website: web ? web.getAttribute("href").trim() : "",
+    telephone: telLink ? strippedText(doc, telLink) : "",
+    location: addr
+      ? addr.textContent.split(/\\s+/).filter(Boolean).join(" ").replace(/,/g, " -")
+      : "",
+  };
+}
+"""
+
+NAVIGATION_STATUS_FN = """
+function navigationStatus() {
+  const nav = performance.getEntriesByType("navigation")[0];
+  return nav && nav.responseStatus ? nav.responseStatus : null;
+}
+"""
+
+LISTING_BODY = """
+return {status: navigationStatus(), links: extractListing(document)};
+"""
+
+# arguments[0]: block phrase looked up in the page text, like the scripts'
+# is_blocked() (the phrase is visible text, so the document is not
+# serialized); fields are only extracted from unblocked pages.
+DETAILS_BODY = """
+const phrase = arguments[0];
+const root = document.body || document.documentElement;
+const blocked = !!phrase && root.textContent.includes(phrase);
+return {
+  status: navigationStatus(),
+  blocked: blocked,
+  details: blocked ? null : extractDetails(document),
+};
+"""
+
+LISTING_SCRIPT = "".join(
+    [STRIPPED_TEXT_FN, EXTRACT_LISTING_FN, NAVIGATION_STATUS_FN, LISTING_BODY]
+)
+DETAILS_SCRIPT = "".join(
+    [STRIPPED_TEXT_FN, EXTRACT_DETAILS_FN, NAVIGATION_STATUS_FN, DETAILS_BODY]
+)
+# Runtime.evaluate takes an expression, not a function body.
+LISTING_EXPRESSION = "(() => {" + LISTING_SCRIPT + "})()"
+
+
+def extract_listing_js(driver):
+    # Returns {"status": ..., "links": [{"href", "name", "company_id",
+    # "columns"}]}; links is None when the page has no listing table.
+    return driver.execute_script(LISTING_SCRIPT)
+
+
+def extract_details_js(driver, block_phrase=""):
+    return driver.execute_script(DETAILS_SCRIPT, block_phrase)
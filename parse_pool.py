@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+
+def default_parse_workers():
+    # One core stays with the fetch loop and the browser.
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def fork_context():
+    # Flat scripts (no __main__ guard) cannot be re-imported by spawned
+    # workers; None means only spawn is available here.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+# Parses fetched pages in worker processes while the caller goes on fetching.
+# put() hands over one page and blocks when max_pending pages are already
+# queued, until the oldest one is parsed (backpressure: the fetch loop never
+# runs more than a window ahead of the parsers). ready() and drain() give
+# results back in put() order, so callers apply them exactly as they would
+# inline. Pages already parsed elsewhere (in-page extraction) go through
+# done() and keep their place in that order. `parse` must be a module-level
+# function so it can be pickled.
+class ParsePool:
+    def __init__(self, workers, parse, max_pending=None, mp_context=None):
+        self.parse = parse
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or 2 * self.workers
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=mp_context)
+        self._pending = deque()
+
+    def _make_room(self):
+        if len(self._pending) >= self.max_pending:
+            wait([self._pending[0][1]])
+
+    def put(self, key, html):
+        self._make_room()
+        self._pending.append((key, self._executor.submit(self.parse, html)))
+
+    def done(self, key, result):
+        future = Future()
+        future.set_result(result)
+        self._pending.append((key, future))
+
+    def ready(self):
+        # (key, result) for every finished page at the head of the queue;
+        # never waits. A worker exception is raised here.
+        while self._pending and self._pending[0][1].done():
+            key, future = self._pending.popleft()
+            yield key, future.result()
+
+    def drain(self):
+        while self._pending:
+            key, future = self._pending.popleft()
+            yield key, future.result()
+
+    def map(self, items):
+        # items yields (key, html); yields (key, result) in the same order,
+        # with at most max_pending pages submitted ahead.
+        for key, html in items:
+            self.put(key, html)
+            yield from self.ready()
+        yield from self.drain()
+
+    def close(self):
+        self._pending.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
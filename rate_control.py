@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+DEFAULT_MIN_RATE = 0.05
+DEFAULT_MAX_RATE = 2.0
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# AIMD pacing shared by every fetch path: the request rate grows by a fixed
+# step while responses are healthy and is cut by a factor on 429/503, blocks,
+# Retry-After or latency well above the best seen so far. max_rate is a hard
+# ceiling. Thread-safe, so async workers and tab pools can share one.
+class AdaptiveRateController:
+    def __init__(
+        self,
+        initial_rate=0.5,
+        min_rate=DEFAULT_MIN_RATE,
+        max_rate=DEFAULT_MAX_RATE,
+        increase=0.05,
+        decrease=0.5,
+        latency_factor=2.0,
+        jitter=0.3,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self.rate = min(self.max_rate, max(min_rate, initial_rate))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.jitter = jitter
+        self.backoffs = 0
+        self._latency = None
+        self._baseline = None
+        self._next_slot = time.monotonic()
+        self._pause_until = 0.0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._pause_until)
+            interval = 1.0 / self.rate
+            spread = random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+            self._next_slot = slot + interval * spread
+            return slot - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _back_off(self, now):
+        # One cut per cooldown window, so a burst of failures from requests
+        # that were already in flight does not collapse the rate to the floor.
+        if now < self._cooldown_until:
+            return
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._cooldown_until = now + 1.0 / self.rate
+        self._next_slot = max(self._next_slot, now + 1.0 / self.rate)
+        self.backoffs += 1
+
+    def record(
+        self, status=None, latency=None, blocked=False, retry_after=None, failed=False
+    ):
+        with self._lock:
+            now = time.monotonic()
+            slow = False
+            if latency is not None:
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    self._latency = 0.8 * self._latency + 0.2 * latency
+                if self._baseline is None or self._latency < self._baseline:
+                    self._baseline = self._latency
+                else:
+                    # Let the baseline drift up slowly so one lucky fast
+                    # response does not mark everything after it as slow.
+                    self._baseline *= 1.01
+                slow = self._latency > self._baseline * self.latency_factor
+
+            if retry_after:
+                self._pause_until = max(self._pause_until, now + retry_after)
+            if failed or blocked or status in (429, 503) or retry_after or slow:
+                self._back_off(now)
+            elif status is None or status < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def current_rate(self):
+        return self.rate
+
+
+def make_pacer(pacing, delay, jitter, min_rate, max_rate):
+    if pacing != "adaptive":
+        return None
+    initial_rate = 1.0 / max(0.05, delay + jitter / 2.0)
+    return AdaptiveRateController(
+        initial_rate=initial_rate, min_rate=min_rate, max_rate=max_rate
+    )
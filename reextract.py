@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from detail_fields import extract_fields
+from extract_enf_installers import collect_links, extract_links, listing_fieldnames
+from html_archive import HtmlArchive
+
+
+DEFAULT_ARCHIVE_DIR = "archive"
+DETAIL_FIELDS = ["website", "telephone", "location"]
+
+_archive = None
+
+
+def init_worker(archive_dir):
+    global _archive
+    _archive = HtmlArchive(archive_dir)
+
+
+def reextract_listing(record):
+    html = _archive.read(record)
+    return record, extract_links(html)
+
+
+def reextract_detail(record):
+    html = _archive.read(record)
+    return record, extract_fields(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-run link or detail extraction over archived ENF pages."
+    )
+    parser.add_argument(
+        "kind",
+        choices=["listing", "detail"],
+        help="Which archived pages to re-extract.",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=DEFAULT_ARCHIVE_DIR,
+        help="Archive written with --archive-dir by the scrapers.",
+    )
+    parser.add_argument("--output", default="", help="CSV output path.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parser processes (default: all CPU cores).",
+    )
+    parser.add_argument(
+        "--all-versions",
+        action="store_true",
+        help="Re-extract every archived fetch instead of the latest per URL.",
+    )
+    args = parser.parse_args()
+
+    archive = HtmlArchive(args.archive_dir)
+    records = archive.records(kind=args.kind, latest_only=not args.all_versions)
+    if not records:
+        print(f"No archived {args.kind} pages in {args.archive_dir}.", file=sys.stderr)
+        return
+
+    output = args.output or f"reextracted_{args.kind}.csv"
+    worker = reextract_listing if args.kind == "listing" else reextract_detail
+    workers = max(1, args.workers)
+    chunksize = max(1, len(records) // (workers * 8))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(args.archive_dir,),
+    ) as executor, open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        results = executor.map(worker, records, chunksize=chunksize)
+        if args.kind == "listing":
+            seen = set()
+            rows = []
+            for _, links in results:
+                collect_links(links, seen, rows)
+            # Columns are only known once every page is parsed.
+            writer = csv.DictWriter(
+                f, fieldnames=listing_fieldnames(["href"], rows), restval=""
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+            count = len(rows)
+        else:
+            count = 0
+            writer.writerow(["url", *DETAIL_FIELDS, "fetched_at"])
+            for record, details in results:
+                values = [details[field] for field in DETAIL_FIELDS]
+                writer.writerow([record["url"], *values, record["fetched_at"]])
+                count += 1
+
+    print(f"Re-extracted {count} rows from {len(records)} pages to {output}")
+
+
+if __name__ == "__main__":
+    main()
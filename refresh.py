@@ -0,0 +1,124 @@
+import csv
+import hashlib
+import json
+import time
+from collections import Counter
+from urllib.error import HTTPError
+from urllib.request import Request
+
+from extract_enf_installers import (
+    DEFAULT_COOKIE_FILE,
+    DEFAULT_UA,
+    accept_encoding,
+    load_cookie_jar,
+    load_user_agent,
+    make_opener,
+    read_body,
+)
+
+
+# Per-company bookkeeping kept next to the detail fields in the CSV.
+FINGERPRINT_COLUMNS = ["fingerprint", "etag", "last_modified", "last_seen"]
+REPORT_KINDS = ["new", "changed", "unchanged", "stale"]
+
+
+def fingerprint(fields):
+    # Whitespace-normalized extracted values in a fixed order, so markup, ads
+    # and other churn around the extracted region do not count as a change.
+    normalized = {name: " ".join(str(value).split()) for name, value in fields.items()}
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def validators(headers):
+    # Only the validators the response carries; a 304 often leaves out
+    # Last-Modified, and the stored value must survive it.
+    if headers is None:
+        return {}
+    found = {}
+    for column, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+        if headers.get(header):
+            found[column] = headers[header]
+    return found
+
+
+def make_refresh_opener(cookie_file=DEFAULT_COOKIE_FILE, user_agent=""):
+    # Same cookies and browser User-Agent the listing scraper hands back to
+    # urllib, so a browser-cleared session carries over.
+    opener, jar = make_opener()
+    for cookie in load_cookie_jar(cookie_file) or ():
+        jar.set_cookie(cookie)
+    headers = {
+        "User-Agent": user_agent or load_user_agent(cookie_file) or DEFAULT_UA,
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept-Encoding": accept_encoding(),
+        "Referer": "https://www.enfsolar.com/",
+    }
+    return opener, headers
+
+
+def conditional_get(opener, url, headers, row, timeout=20.0):
+    # Returns (status, html, response headers); html is "" for a 304.
+    request_headers = dict(headers)
+    if row.get("etag"):
+        request_headers["If-None-Match"] = row["etag"]
+    if row.get("last_modified"):
+        request_headers["If-Modified-Since"] = row["last_modified"]
+    req = Request(url, headers=request_headers)
+    try:
+        with opener.open(req, timeout=timeout) as resp:
+            status = resp.getcode()
+            if status == 304:
+                resp.read()
+                return status, "", resp.headers
+            return status, read_body(resp), resp.headers
+    except HTTPError as err:
+        if err.code == 304:
+            return err.code, "", err.headers
+        try:
+            body = read_body(err)
+        except Exception:
+            body = ""
+        return err.code, body, err.headers
+
+
+# One CSV per run listing what moved: new companies, changed fields (old and
+# new values side by side) and rows left for the browser. Unchanged rows are
+# only counted. Lines are flushed as they are written so an interrupted run
+# still leaves its report.
+class ChangeReport:
+    def __init__(self, path, fields):
+        self.path = path
+        self.fields = list(fields)
+        self.counts = Counter()
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(
+            ["checked_at", "change", "name", "url", "changed_fields"]
+            + [f"old_{field}" for field in self.fields]
+            + [f"new_{field}" for field in self.fields]
+        )
+
+    def record(self, kind, row, before=None):
+        self.counts[kind] += 1
+        if kind == "unchanged":
+            return
+        before = before or {}
+        changed = [
+            field
+            for field in self.fields
+            if " ".join(before.get(field, "").split()) != " ".join(row[field].split())
+        ]
+        self._writer.writerow(
+            [time.strftime("%Y-%m-%dT%H:%M:%S"), kind, row["name"], row["url"]]
+            + [",".join(changed) if kind == "changed" else ""]
+            + [before.get(field, "") for field in self.fields]
+            + [row[field] if kind != "stale" else "" for field in self.fields]
+        )
+        self._file.flush()
+
+    def summary(self):
+        return ", ".join(f"{self.counts[kind]} {kind}" for kind in REPORT_KINDS)
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
+
+
+DEFAULT_DB = "enf.db"
+DEFAULT_BATCH_ROWS = 200
+DEFAULT_BATCH_SECONDS = 5.0
+BUSY_TIMEOUT_MS = 30000
+BASE_URL = "https://www.enfsolar.com"
+LINK_COLUMNS = ["href", "name", "company_id"]
+
+# Lookup columns are indexed; every other column lives in the JSON row.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    slug TEXT PRIMARY KEY,
+    company_id TEXT,
+    url TEXT,
+    name TEXT,
+    status TEXT NOT NULL DEFAULT '',
+    last_fetched TEXT,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS companies_url ON companies (url);
+CREATE INDEX IF NOT EXISTS companies_status ON companies (status);
+CREATE INDEX IF NOT EXISTS companies_last_fetched ON companies (last_fetched);
+CREATE INDEX IF NOT EXISTS companies_company_id ON companies (company_id);
+"""
+
+# Only the columns a row actually has are overwritten; a listing upsert
+# keeps the detail fields and status already stored, and the JSON rows are
+# merged key by key.
+UPSERT = """
+INSERT INTO companies (slug, company_id, url, name, status, last_fetched, data)
+VALUES (?, ?, ?, ?, COALESCE(?, ''), ?, ?)
+ON CONFLICT (slug) DO UPDATE SET
+    company_id = COALESCE(NULLIF(excluded.company_id, ''), companies.company_id),
+    url = COALESCE(excluded.url, companies.url),
+    name = COALESCE(excluded.name, companies.name),
+    status = CASE WHEN ? IS NULL THEN companies.status ELSE excluded.status END,
+    last_fetched = COALESCE(excluded.last_fetched, companies.last_fetched),
+    data = json_patch(companies.data, excluded.data)
+"""
+
+
+def company_slug(url):
+    # https://www.enfsolar.com/aesolar?directory=installer -> "aesolar"
+    path = urlsplit(urljoin(BASE_URL, url)).path.strip("/")
+    return path.split("/")[0] if path else url
+
+
+def connect(path):
+    # WAL lets several scraper processes read while one writes; writers
+    # queue on the busy timeout instead of failing with "database is locked".
+    conn = sqlite3.connect(
+        path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# Company rows keyed by their ENF slug. upsert() buffers rows and commits
+# them in one short transaction every batch_rows rows or batch_seconds
+# seconds (and on flush/close), so the write lock is held briefly and other
+# processes can interleave their own batches. Rows come back as the same
+# dicts the CSV scripts use, in first-insert order.
+class CompanyStore:
+    def __init__(
+        self,
+        path=DEFAULT_DB,
+        batch_rows=DEFAULT_BATCH_ROWS,
+        batch_seconds=DEFAULT_BATCH_SECONDS,
+    ):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.conn = connect(path)
+        self._pending = {}
+        self._last_commit = time.monotonic()
+
+    def upsert(self, row):
+        row = dict(row)
+        href = row.pop("href", None)
+        if not row.get("url") and href:
+            row["url"] = urljoin(BASE_URL, href)
+        slug = company_slug(row["url"])
+        if slug in self._pending:
+            self._pending[slug].update(row)
+        else:
+            self._pending[slug] = row
+        if (
+            len(self._pending) >= self.batch_rows
+            or time.monotonic() - self._last_commit >= self.batch_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            self._last_commit = time.monotonic()
+            return
+        params = []
+        for slug, row in self._pending.items():
+            status = row.get("status")
+            params.append(
+                (
+                    slug,
+                    row.get("company_id") or "",
+                    row.get("url"),
+                    row.get("name"),
+                    status,
+                    row.get("last_seen") or None,
+                    json.dumps(row, ensure_ascii=False),
+                    status,
+                )
+            )
+        # IMMEDIATE takes the write lock up front, so a concurrent writer
+        # waits on busy_timeout here rather than failing mid-transaction.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(UPSERT, params)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self._pending.clear()
+        self._last_commit = time.monotonic()
+
+    def rows(self, status=None, exclude_status=None):
+        self.flush()
+        query = "SELECT data FROM companies"
+        args = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            args = (status,)
+        elif exclude_status is not None:
+            query += " WHERE status != ?"
+            args = (exclude_status,)
+        cursor = self.conn.execute(query + " ORDER BY rowid", args)
+        return [json.loads(data) for (data,) in cursor]
+
+    def get(self, url):
+        self.flush()
+        found = self.conn.execute(
+            "SELECT data FROM companies WHERE url = ?", (url,)
+        ).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def counts(self):
+        self.flush()
+        return dict(
+            self.conn.execute("SELECT status, COUNT(*) FROM companies GROUP BY status")
+        )
+
+    def import_csv(self, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            count = 0
+            for row in csv.DictReader(f):
+                self.upsert(row)
+                count += 1
+        self.flush()
+        return count
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+
+
+def csv_layout(rows, layout):
+    # "details": germany_installers.csv (name, url, listing and detail
+    # columns); "links": enf_germany_installers.csv (href, name, company_id,
+    # listing columns).
+    if layout == "links":
+        names = list(LINK_COLUMNS)
+        for row in rows:
+            for key in row:
+                if key.startswith("listing_") and key not in names:
+                    names.append(key)
+        return names, [dict(row, href=row.get("url", "")) for row in rows]
+    names = ["name", "url"]
+    for row in rows:
+        for key in row:
+            if key not in names:
+                names.append(key)
+    return names, rows
+
+
+def export_csv(store, path, layout="details"):
+    names, rows = csv_layout(store.rows(), layout)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=names, restval="", extrasaction="ignore"
+        )
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def open_store(path):
+    if not path:
+        return None
+    return CompanyStore(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="SQLite store for ENF companies: import, export and stats."
+    )
+    parser.add_argument("command", choices=["export-csv", "import-csv", "stats"])
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database path.")
+    parser.add_argument(
+        "--csv",
+        default="germany_installers.csv",
+        help="CSV to write (export-csv) or read (import-csv).",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["details", "links"],
+        default="details",
+        help="export-csv column layout: germany_installers.csv (details) or "
+        "enf_germany_installers.csv (links).",
+    )
+    args = parser.parse_args()
+
+    store = CompanyStore(args.db)
+    try:
+        if args.command == "export-csv":
+            count = export_csv(store, args.csv, args.layout)
+            print(f"Wrote {count} companies to {args.csv}")
+        elif args.command == "import-csv":
+            try:
+                count = store.import_csv(args.csv)
+            except FileNotFoundError:
+                print(f"CSV not found: {args.csv}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Imported {count} rows from {args.csv} into {args.db}")
+        else:
+            counts = store.counts()
+            total = sum(counts.values())
+            by_status = ", ".join(
+                f"{count} {status or '(not fetched)'}"
+                for status, count in sorted(counts.items())
+            )
+            print(f"{total} companies in {args.db}: {by_status}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
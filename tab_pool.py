@@ -0,0 +1,186 @@
+import random
+import time
+
+
+# Polled per busy tab. Returns null until the page we navigated to is usable:
+# `selector` matched after DOMContentLoaded, or the load finished without it
+# (block pages have no listing table). Then one scoped outerHTML plus the
+# navigation status from the Navigation Timing entry (Chrome 109+).
+POLL_TAB_JS = """
+if (window.__enfStale) return null;
+const state = document.readyState;
+const el = document.querySelector(arguments[0]);
+if (!((el && state !== "loading") || state === "complete")) return null;
+const scoped = arguments[1] ? document.querySelector(arguments[1]) : null;
+const nav = performance.getEntriesByType("navigation")[0];
+return {
+  html: (scoped || document.documentElement).outerHTML,
+  status: nav && nav.responseStatus ? nav.responseStatus : null,
+};
+"""
+
+SNAPSHOT_TAB_JS = """
+const scoped = arguments[0] ? document.querySelector(arguments[0]) : null;
+return (scoped || document.documentElement).outerHTML;
+"""
+
+START_NAVIGATION_JS = """
+window.__enfStale = true;
+window.location.href = arguments[0];
+"""
+
+
+# Several tabs of the attached browser share its cookies and challenge
+# clearance. Navigations are started with window.location so none of them
+# blocks the driver; the scheduler then visits busy tabs round-robin and
+# hands out the next URL as soon as one is ready. Results come back in job
+# order. With pageLoadStrategy "normal" chromedriver still waits for a tab's
+# load on every switch, but the other tabs keep loading meanwhile; "none"
+# removes that wait.
+class TabPool:
+    def __init__(
+        self,
+        driver,
+        size,
+        ready_selector,
+        capture_selector=None,
+        timeout=15.0,
+        pacer=None,
+        delay=(0.0, 0.0),
+        is_blocked=None,
+    ):
+        self.driver = driver
+        self.ready_selector = ready_selector
+        self.capture_selector = capture_selector
+        self.timeout = timeout
+        self.pacer = pacer
+        self.delay = delay
+        self.is_blocked = is_blocked
+        self.home = driver.current_window_handle
+        self.handles = [self.home]
+        self._opened = []
+        for _ in range(max(1, size) - 1):
+            driver.switch_to.new_window("tab")
+            self.handles.append(driver.current_window_handle)
+            self._opened.append(driver.current_window_handle)
+        driver.switch_to.window(self.home)
+        self._current = self.home
+
+    def _switch(self, handle):
+        if handle != self._current:
+            self.driver.switch_to.window(handle)
+            self._current = handle
+
+    def _next_start(self, now):
+        if self.pacer is not None:
+            return now + self.pacer.reserve()
+        low, high = self.delay
+        return now + random.uniform(low, max(low, high))
+
+    def _start(self, handle, url):
+        self._switch(handle)
+        try:
+            self.driver.execute_script(START_NAVIGATION_JS, url)
+        except Exception:
+            # Some pages tear down the script context as navigation starts.
+            pass
+
+    def _poll(self, handle):
+        self._switch(handle)
+        try:
+            return self.driver.execute_script(
+                POLL_TAB_JS, self.ready_selector, self.capture_selector
+            )
+        except Exception:
+            # The document was replaced while the script ran.
+            return None
+
+    def _snapshot(self, handle):
+        self._switch(handle)
+        try:
+            html = self.driver.execute_script(SNAPSHOT_TAB_JS, self.capture_selector)
+        except Exception:
+            html = ""
+        return {"html": html or "", "status": None}
+
+    def _finish(self, url, started, snapshot, ready):
+        latency = time.monotonic() - started
+        result = {
+            "url": url,
+            "html": snapshot["html"],
+            "status": snapshot["status"],
+            "ready": ready,
+            "latency": latency,
+            "blocked": False,
+        }
+        if self.is_blocked is not None:
+            result["blocked"] = self.is_blocked(result["html"], result["status"])
+        if self.pacer is not None:
+            self.pacer.record(
+                status=result["status"], latency=latency, blocked=result["blocked"]
+            )
+        return result
+
+    def fetch(self, jobs):
+        # jobs yields (key, url); yields (key, result) in the same order.
+        jobs = iter(jobs)
+        busy = {}
+        idle = list(self.handles)
+        done = {}
+        dispatched = 0
+        next_start = self._next_start(time.monotonic())
+        exhausted = False
+        emitted = 0
+
+        while True:
+            now = time.monotonic()
+            progress = False
+            while idle and not exhausted and now >= next_start:
+                try:
+                    key, url = next(jobs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                handle = idle.pop(0)
+                self._start(handle, url)
+                busy[handle] = (dispatched, key, url, now)
+                dispatched += 1
+                next_start = self._next_start(now)
+                progress = True
+
+            for handle in list(busy):
+                index, key, url, started = busy[handle]
+                snapshot = self._poll(handle)
+                ready = snapshot is not None
+                if not ready and time.monotonic() - started < self.timeout:
+                    continue
+                if not ready:
+                    snapshot = self._snapshot(handle)
+                done[index] = (key, self._finish(url, started, snapshot, ready))
+                del busy[handle]
+                idle.append(handle)
+                progress = True
+
+            while emitted in done:
+                yield done.pop(emitted)
+                emitted += 1
+
+            if exhausted and not busy and not done:
+                return
+            if not progress:
+                if busy:
+                    time.sleep(0.05)
+                else:
+                    time.sleep(max(0.0, next_start - time.monotonic()))
+
+    def close(self):
+        for handle in self._opened:
+            try:
+                self._switch(handle)
+                self.driver.close()
+            except Exception:
+                continue
+        self._opened = []
+        self.handles = [self.home]
+        self.driver.switch_to.window(self.home)
+        self._current = self.home